@@ -1 +1,4 @@
 export const apiURL = "https://quizapp-server-flame.vercel.app/";
+// Pause after a members event before the member list is refetched, events
+// arriving meanwhile share the refetch
+export const MEMBERS_REFETCH_MS = 1000;
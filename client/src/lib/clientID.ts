@@ -0,0 +1,16 @@
+import axios from "axios";
+
+// Polling routes are rate limited per tab, so a classroom sharing one address
+// isn't limited like a single browser. The id lives as long as the tab
+const key = "clientID";
+
+function tabID(): string {
+  let id = sessionStorage.getItem(key);
+  if (!id) {
+    id = crypto.randomUUID();
+    sessionStorage.setItem(key, id);
+  }
+  return id;
+}
+
+axios.defaults.headers.common["X-Client-ID"] = tabID();
@@ -0,0 +1,21 @@
+// Runs run once, delay ms after the first call, however many calls arrive
+// meanwhile. A join burst then costs every open tab one refetch, not one per
+// event. The jitter keeps the tabs of a room from refetching in step
+export function coalesce(run: () => void, delay: number, jitter = delay / 2) {
+  let timer: ReturnType<typeof setTimeout> | null = null;
+  const schedule = () => {
+    if (timer !== null) return;
+    timer = setTimeout(
+      () => {
+        timer = null;
+        run();
+      },
+      delay + Math.random() * jitter,
+    );
+  };
+  schedule.cancel = () => {
+    if (timer !== null) clearTimeout(timer);
+    timer = null;
+  };
+  return schedule;
+}
@@ -0,0 +1,5 @@
+// Authorization for the routes a guest acts on, empty for registered users
+export function guestHeaders(): Record<string, string> {
+  const token = localStorage.getItem("guestToken");
+  return token ? { Authorization: `Bearer ${token}` } : {};
+}
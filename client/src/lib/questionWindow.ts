@@ -0,0 +1,83 @@
+import { apiURL } from "@/constans";
+import { cachedPost } from "@/lib/cachedPost";
+
+export interface WindowQuestion {
+  number: number;
+  id: string;
+  question: string;
+  answers: {
+    a: string;
+    b: string;
+    c: string;
+    d: string;
+  };
+  point: number;
+  time: number;
+  // Server clock, in seconds, when the question may be shown in paced games
+  revealAt: number | null;
+}
+
+interface QuestionWindowResponse {
+  questions: WindowQuestion[];
+  questionCount: number;
+}
+
+interface RoomQuestions {
+  questions: Map<number, WindowQuestion>;
+  questionCount: number;
+  // Milliseconds to add to Date.now() to get the server clock
+  clockOffset: number;
+}
+
+const rooms = new Map<string, RoomQuestions>();
+const pending = new Map<string, Promise<void>>();
+
+const fetchWindow = (roomCode: string, from: number) => {
+  const key = `${roomCode}:${from}`;
+  if (!pending.has(key)) {
+    const request = cachedPost<QuestionWindowResponse>(
+      `${apiURL}questionWindow`,
+      { roomCode, from },
+    )
+      .then((response) => {
+        const room = rooms.get(roomCode) ?? {
+          questions: new Map(),
+          questionCount: 0,
+          clockOffset: 0,
+        };
+        response.data.questions.forEach((question) =>
+          room.questions.set(question.number, question),
+        );
+        room.questionCount = response.data.questionCount;
+        const serverTime = Number(response.headers["x-server-time"]);
+        if (serverTime) {
+          room.clockOffset = serverTime * 1000 - Date.now();
+        }
+        rooms.set(roomCode, room);
+      })
+      .finally(() => pending.delete(key));
+    pending.set(key, request);
+  }
+  return pending.get(key)!;
+};
+
+export const loadQuestion = async (roomCode: string, number: number) => {
+  if (number === 1) {
+    // A new game, questions may have changed since the last one
+    rooms.delete(roomCode);
+  }
+  if (!rooms.get(roomCode)?.questions.has(number)) {
+    await fetchWindow(roomCode, number);
+  }
+  const room = rooms.get(roomCode)!;
+
+  // Fetch the next window while the last cached question is being answered
+  if (!room.questions.has(number + 1) && number < room.questionCount) {
+    fetchWindow(roomCode, number + 1).catch(() => undefined);
+  }
+  return {
+    question: room.questions.get(number) ?? null,
+    questionCount: room.questionCount,
+    clockOffset: room.clockOffset,
+  };
+};
@@ -94,6 +94,7 @@ const Auth = () => {
         localStorage.setItem("userName", response.data.user.name);
         localStorage.setItem("userEmail", response.data.user.email);
         localStorage.setItem("userID", response.data.user.id);
+        localStorage.removeItem("guestToken");
         window.location.href = "/";
       }
     } catch (error) {
@@ -134,6 +135,8 @@ const Auth = () => {
         localStorage.setItem("userName", name || "Guest");
         localStorage.setItem("userEmail", "guest@app.com");
         localStorage.setItem("userID", response.data.room.guest.id);
+        // Vouches for this guest id on the routes that answer or leave for it
+        localStorage.setItem("guestToken", response.data.room.guest.token);
         window.location.href = "/room/" + response.data.room.code;
       }
     } catch (error) {
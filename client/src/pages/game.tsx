@@ -2,6 +2,8 @@ import { useNavigate, useParams } from "react-router-dom";
 import axios from "axios";
 import { useEffect, useState } from "react";
 import { apiURL } from "@/constans";
+import { loadQuestion, type WindowQuestion } from "@/lib/questionWindow";
+import { guestHeaders } from "@/lib/guestToken";
 import { toast } from "sonner";
 import { Label } from "@/components/ui/label";
 import { RadioGroup, RadioGroupItem } from "@/components/ui/radio-group";
@@ -16,24 +18,13 @@ import { Brain, Clock, Star, X } from "lucide-react";
 import { Progress } from "@/components/ui/progress";
 
 interface QuestionData {
-  question: {
-    answers: {
-      a: string;
-      b: string;
-      c: string;
-      d: string;
-    };
-    correct: string;
-    id: string;
-    point: number;
-    question: string;
-    time: number;
-  };
+  question: WindowQuestion;
 }
 
 interface SubmitAnswerResponse {
   error?: boolean;
   message?: string;
+  points?: number;
   status?: string;
 }
 
@@ -63,24 +54,37 @@ const Game = () => {
   });
 
   useEffect(() => {
+    let revealTimer: ReturnType<typeof setTimeout> | undefined;
+
     const fetchQuestionData = async () => {
       try {
-        const response = await axios.post<QuestionData>(
-          `${apiURL}getQuestion`,
-          {
-            roomCode,
-            questionNumber,
-          },
-          {
-            headers: {
-              "Content-Type": "application/json",
-            },
-          },
+        // Served from the prefetched window, the next one loads in the background
+        const { question, clockOffset } = await loadQuestion(
+          roomCode!,
+          parseInt(questionNumber!),
         );
+        if (!question) {
+          setError("No more questions");
+          setLoading(false);
+          return;
+        }
 
-        setQuestionData(response.data);
-        setStartTime(Date.now());
-        setTimeLeft(response.data.question.time);
+        const showQuestion = () => {
+          setQuestionData({ question });
+          setStartTime(Date.now());
+          setTimeLeft(question.time);
+          setLoading(false);
+        };
+        // Paced games hold each question until the server scheduled reveal
+        const wait = question.revealAt
+          ? question.revealAt * 1000 - (Date.now() + clockOffset)
+          : 0;
+        if (wait > 0) {
+          setLoading(true);
+          revealTimer = setTimeout(showQuestion, wait);
+        } else {
+          showQuestion();
+        }
       } catch (err) {
         const errorMessage =
           axios.isAxiosError(err) && err.response
@@ -88,12 +92,12 @@ const Game = () => {
             : "Failed to fetch question data";
         setError(errorMessage);
         toast.error("Failed to fetch question data");
-      } finally {
         setLoading(false);
       }
     };
 
     fetchQuestionData();
+    return () => clearTimeout(revealTimer);
   }, [roomCode, questionNumber]);
 
   // Timer effect
@@ -107,11 +111,15 @@ const Game = () => {
       if (remaining <= 0) {
         clearInterval(timer);
         toast.error("Time's up!");
-        axios.post(`${apiURL}timeoutAnswer`, {
-          roomCode,
-          userID,
-          questionNumber,
-        });
+        axios.post(
+          `${apiURL}timeoutAnswer`,
+          {
+            roomCode,
+            userID,
+            questionNumber,
+          },
+          { headers: guestHeaders() },
+        );
         navigate(`/game/${roomCode}/${parseInt(questionNumber!) + 1}`);
       } else {
         setTimeLeft(remaining);
@@ -122,9 +130,8 @@ const Game = () => {
   }, [questionData, startTime, roomCode, questionNumber, navigate]);
 
   const onSubmit = async (data: z.infer<typeof FormSchema>) => {
-    const elapsedTime = startTime ? (Date.now() - startTime) / 1000 : 0;
-
     try {
+      // The server times and scores the answer itself
       const response = await axios.post<SubmitAnswerResponse>(
         `${apiURL}submitAnswer`,
         {
@@ -132,14 +139,11 @@ const Game = () => {
           userID,
           questionNumber,
           answer: data.answer,
-          point: questionData?.question.point,
-          timeTaken: elapsedTime,
-          time: questionData?.question.time,
-          correct: questionData?.question.correct,
         },
         {
           headers: {
             "Content-Type": "application/json",
+            ...guestHeaders(),
           },
         },
       );
@@ -187,7 +191,7 @@ const Game = () => {
   }
 
   if (error) {
-    if (error === "list index out of range") {
+    if (error === "No more questions") {
       navigate(`/leaderboard/${roomCode}`);
       return (
         <div className="flex min-h-screen items-center justify-center p-4">
@@ -1,6 +1,7 @@
 import { useEffect, useState } from "react";
 import axios from "axios";
 import { apiURL } from "@/constans.ts";
+import { cachedPost } from "@/lib/cachedPost";
 import { useParams } from "react-router-dom";
 import { ScrollArea } from "@/components/ui/scroll-area";
 import { Check, Sparkles, Trophy, X } from "lucide-react";
@@ -43,16 +44,16 @@ const Leaderboard = () => {
 
   const fetchLeaderboard = async (shouldShowDialog = false) => {
     try {
-      const response = await axios.post(`${apiURL}leaderboard`, { roomCode });
+      const response = await cachedPost(`${apiURL}leaderboard`, {
+        roomCode,
+        userID,
+      });
       setLeaderboard(response.data.leaderboard);
       setRoomName(response.data.roomName);
 
-      const userIndex = response.data.leaderboard.findIndex(
-        (member: Member) => member.id === userID,
-      );
-      if (userIndex !== -1) {
-        setUserScore(response.data.leaderboard[userIndex]);
-        setUserRank(userIndex + 1);
+      if (response.data.user) {
+        setUserScore(response.data.user);
+        setUserRank(response.data.user.rank);
         if (shouldShowDialog) {
           setIsDialogOpen(true);
         }
@@ -68,10 +69,38 @@ const Leaderboard = () => {
     }
   };
 
+  const applyScoreDelta = (delta: Member) => {
+    setLeaderboard((prevLeaderboard) => {
+      const updated = prevLeaderboard
+        .map((member) =>
+          member.id === delta.id
+            ? {
+                ...member,
+                points: (member.points || 0) + delta.points,
+                trueAnswers: (member.trueAnswers || 0) + delta.trueAnswers,
+                falseAnswers: (member.falseAnswers || 0) + delta.falseAnswers,
+              }
+            : member,
+        )
+        .sort((a, b) => (b.points || 0) - (a.points || 0));
+
+      const userIndex = updated.findIndex((member) => member.id === userID);
+      if (userIndex !== -1) {
+        setUserScore(updated[userIndex]);
+        setUserRank(userIndex + 1);
+      }
+      return updated;
+    });
+  };
+
   useEffect(() => {
     fetchLeaderboard(true);
-    const interval = setInterval(() => fetchLeaderboard(false), 6000);
-    return () => clearInterval(interval);
+    const events = new EventSource(`${apiURL}events/${roomCode}`);
+    events.addEventListener("leaderboard", (event) =>
+      applyScoreDelta(JSON.parse((event as MessageEvent).data)),
+    );
+    events.addEventListener("members", () => fetchLeaderboard(false));
+    return () => events.close();
   }, [roomCode]);
 
   if (loading) {
@@ -31,7 +31,9 @@ import {
   SelectTrigger,
   SelectValue,
 } from "@/components/ui/select";
-import { apiURL } from "@/constans.ts";
+import { apiURL, MEMBERS_REFETCH_MS } from "@/constans.ts";
+import { cachedPost } from "@/lib/cachedPost";
+import { coalesce } from "@/lib/coalesce";
 import { Check, Copy, ListOrdered, Trash, UserX } from "lucide-react";
 import {
   Card,
@@ -98,7 +100,7 @@ const ManageRoom: React.FC = () => {
       const token = localStorage.getItem("token");
       const email = localStorage.getItem("userEmail");
       try {
-        const response = await axios.post(
+        const response = await cachedPost(
           apiURL + "room",
           {
             roomCode: roomCode,
@@ -112,6 +114,8 @@ const ManageRoom: React.FC = () => {
           },
         );
         setRoomData(response.data);
+        // Only /room, for members of the room, carries the answer key
+        setQuestions(response.data.room.questions);
       } catch (err) {
         if (err instanceof Error) {
           setError(err.message);
@@ -122,30 +126,7 @@ const ManageRoom: React.FC = () => {
       }
     };
 
-    const fetchQuestions = async () => {
-      const token = localStorage.getItem("token");
-      try {
-        const response = await axios.post(
-          apiURL + "getQuestions",
-          { roomCode },
-          {
-            headers: {
-              Authorization: `Bearer ${token}`,
-              "Content-Type": "application/json",
-            },
-          },
-        );
-        setQuestions(response.data.questions);
-      } catch (err) {
-        if (err instanceof Error) {
-          setError(err.message);
-        }
-        toast.error("Failed to fetch questions.");
-      }
-    };
-
     fetchRoomData();
-    fetchQuestions();
   }, [roomCode]);
 
   useEffect(() => {
@@ -172,14 +153,24 @@ const ManageRoom: React.FC = () => {
             },
           };
         });
-        // eslint-disable-next-line @typescript-eslint/no-unused-vars
       } catch (err) {
-        toast.error("Failed to fetch users.");
+        if (axios.isAxiosError(err) && err.response?.status === 429) {
+          // Over the polling budget, try again after the next pause
+          refetchUsers();
+        } else {
+          toast.error("Failed to fetch users.");
+        }
       }
     };
 
-    const intervalId = setInterval(fetchUsers, 4000);
-    return () => clearInterval(intervalId);
+    // Server pushes room changes, members events only say something changed
+    const refetchUsers = coalesce(fetchUsers, MEMBERS_REFETCH_MS);
+    const events = new EventSource(apiURL + "events/" + roomCode);
+    events.addEventListener("members", refetchUsers);
+    return () => {
+      events.close();
+      refetchUsers.cancel();
+    };
   }, [roomCode]);
 
   if (loading)
@@ -42,7 +42,10 @@ import {
   Settings,
   Users,
 } from "lucide-react";
-import { apiURL } from "@/constans.ts";
+import { apiURL, MEMBERS_REFETCH_MS } from "@/constans.ts";
+import { cachedPost } from "@/lib/cachedPost";
+import { guestHeaders } from "@/lib/guestToken";
+import { coalesce } from "@/lib/coalesce";
 import { Badge } from "@/components/ui/badge";
 
 interface RoomData {
@@ -71,7 +74,7 @@ const Room: React.FC = () => {
     const fetchRoomData = async () => {
       const email = localStorage.getItem("userEmail");
       try {
-        const response = await axios.post(
+        const response = await cachedPost(
           apiURL + "Room",
           {
             roomCode: roomCode,
@@ -84,6 +87,10 @@ const Room: React.FC = () => {
           },
         );
         setRoomData(response.data);
+        // The game may have started before this page opened
+        if (response.data.room.gameStarted === true) {
+          window.location.pathname = `/game/${roomCode}/1`;
+        }
       } catch (err: unknown) {
         if (err instanceof Error) {
           setError(err.message);
@@ -124,17 +131,24 @@ const Room: React.FC = () => {
           };
         });
       } catch (err: unknown) {
-        if (err instanceof Error) {
+        if (axios.isAxiosError(err) && err.response?.status === 429) {
+          // Over the polling budget, try again after the next pause
+          refetchUsers();
+        } else if (err instanceof Error) {
           toast.error("Failed to fetch users.");
         }
       }
     };
 
-    const intervalId = setInterval(fetchUsers, 3000);
-    return () => clearInterval(intervalId);
-  }, [roomCode]);
+    const updateGameStatus = (gameStarted: boolean) => {
+      setGameStatus(gameStarted);
+      if (gameStarted === true) {
+        window.location.pathname = `/game/${roomCode}/1`;
+      }
+    };
 
-  useEffect(() => {
+    // Events sent while the stream was down are lost, so every (re)connect
+    // checks whether the game started meanwhile
     const fetchGameStatus = async () => {
       try {
         const response = await axios.post(
@@ -146,19 +160,27 @@ const Room: React.FC = () => {
             },
           },
         );
-        setGameStatus(response.data.gameStarted);
-        if (response.data.gameStarted === true) {
-          window.location.pathname = `/game/${roomCode}/1`;
-        }
-      } catch (err: unknown) {
-        if (err instanceof Error) {
-          toast.error("Failed to fetch game status.");
-        }
+        updateGameStatus(response.data.gameStarted);
+      } catch (error) {
+        // The next gameStatus event or reconnect tries again
+        console.error("Error fetching game status:", error);
       }
     };
 
-    const intervalId = setInterval(fetchGameStatus, 6000);
-    return () => clearInterval(intervalId);
+    // Server pushes room changes, fetch only when something happened and at
+    // most once per pause however many players joined meanwhile
+    const refetchUsers = coalesce(fetchUsers, MEMBERS_REFETCH_MS);
+    const events = new EventSource(apiURL + "events/" + roomCode);
+    events.addEventListener("open", fetchGameStatus);
+    events.addEventListener("members", refetchUsers);
+    events.addEventListener("gameStatus", (event) => {
+      const data = JSON.parse((event as MessageEvent).data);
+      updateGameStatus(data.gameStarted);
+    });
+    return () => {
+      events.close();
+      refetchUsers.cancel();
+    };
   }, [roomCode]);
 
   if (loading)
@@ -194,10 +216,12 @@ const Room: React.FC = () => {
         {
           roomCode: roomCode,
           email: email,
+          userID: localStorage.getItem("userID"),
         },
         {
           headers: {
             "Content-Type": "application/json",
+            ...guestHeaders(),
           },
         },
       );
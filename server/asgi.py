@@ -0,0 +1,485 @@
+# Async serving mode: uvicorn asgi:app
+# Room and game routes run as coroutines over the async Mongo driver, every
+# other route is handed to the Flask app in server.py
+import asyncio
+import logging
+from time import perf_counter, time
+import orjson
+from config import Config
+from server import (
+    answerClock,
+    app as flaskApp,
+    archiver,
+    gameState,
+    guestLog,
+    rateLimiter,
+    responseCache,
+    roomEvents,
+    roomStore,
+)
+from utils import metrics
+from utils.archive import archivedLeaderboard
+from utils.encoding import compress, dumps, negotiate
+from utils.database import closeAsyncClient
+from utils.guestAuth import guestClaims, guestError, liveGuest
+from utils.questions import playerQuestion, questionWindow
+from utils.rateLimit import clientAddress, tabID
+from utils.scoring import answerIncrements, scoreDelta
+from utils.singleFlight import AsyncSingleFlight
+from utils.storage import openAsyncStore
+from utils.timing import answerElapsed
+from utils.wsgiPool import PooledWsgiToAsgi
+
+logger = logging.getLogger("asgi")
+
+wsgiApp = PooledWsgiToAsgi(flaskApp, threads=Config.Async.WSGI_THREADS)
+routes = {}
+# Request fields each cached route's response depends on besides the room, and
+# whether only question edits change it
+cachedFields = {}
+# Routes acting for a player, guests must send the token /joinGuest gave them
+guestRoutes = set()
+asyncRoomStore = openAsyncStore(roomStore)
+# Concurrent misses for the same cached response share one handler run
+renders = AsyncSingleFlight()
+
+corsHeaders = [
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-expose-headers", b"ETag, X-Server-Time"),
+]
+
+
+def route(path, cached=None, questionsOnly=False, guest=False):
+    def decorator(function):
+        routes[path] = function
+        if cached is not None:
+            cachedFields[path] = (cached, questionsOnly)
+        if guest:
+            guestRoutes.add(path)
+        return function
+
+    return decorator
+
+
+@route("/getQuestions", cached=(), questionsOnly=True)
+async def getQuestions(data):
+    if not await asyncRoomStore.findRoom(data["roomCode"], ()):
+        return {"error": "Room not found"}, 404
+
+    questions = await asyncRoomStore.questions(data["roomCode"])
+    return {
+        "message": "Questions found",
+        "questions": [playerQuestion(question) for question in questions],
+    }, 200
+
+
+@route("/getQuestion", cached=("questionNumber",), questionsOnly=True)
+async def getQuestion(data):
+    questionNumber = int(data["questionNumber"])
+
+    liveRoom = gameState.get(data["roomCode"])
+    if not liveRoom:
+        if not await asyncRoomStore.findRoom(data["roomCode"], ()):
+            return {"error": "Room not found"}, 404
+
+        question = await asyncRoomStore.questionAt(data["roomCode"], questionNumber)
+    elif 1 <= questionNumber <= len(liveRoom.questions):
+        # Adjust for 1-based index
+        question = liveRoom.questions[questionNumber - 1]
+    else:
+        question = None
+
+    if not question:
+        return {"error": "Question not found"}, 404
+    return {"message": "Question found", "question": playerQuestion(question)}, 200
+
+
+@route("/questionWindow", cached=("from", "ahead"), questionsOnly=True)
+async def getQuestionWindow(data):
+    first = int(data.get("from", 1))
+    ahead = min(
+        int(data.get("ahead", Config.Game.WINDOW_AHEAD)), Config.Game.MAX_WINDOW_AHEAD
+    )
+    if first < 1 or ahead < 0:
+        return {"error": "from must be 1 or more, ahead 0 or more"}, 400
+
+    liveRoom = gameState.get(data["roomCode"])
+    if liveRoom:
+        questionCount = len(liveRoom.questions)
+        window = questionWindow(liveRoom.questions, first, ahead + 1, liveRoom.schedule)
+    else:
+        result = await asyncRoomStore.questionWindow(data["roomCode"], first, ahead + 1)
+
+        if result is None:
+            return {"error": "Room not found"}, 404
+
+        questionCount, window = result
+    return {
+        "message": "Questions found",
+        "questions": window,
+        "questionCount": questionCount,
+    }, 200
+
+
+@route("/loadUsersRoom", cached=())
+async def loadUsersRoom(data):
+    if not await asyncRoomStore.findRoom(data["roomCode"], ()):
+        return {"error": "Room not found"}, 404
+
+    # Only the names of the users
+    user_names = await asyncRoomStore.memberNames(data["roomCode"])
+
+    return {"message": "Users found", "users": user_names}, 200
+
+
+@route("/loadUsers", cached=())
+async def loadUsers(data):
+    if not await asyncRoomStore.findRoom(data["roomCode"], ()):
+        return {"error": "Room not found"}, 404
+
+    members = await asyncRoomStore.members(data["roomCode"])
+    return {"message": "Users found", "users": members}, 200
+
+
+@route("/getGameStatus", cached=())
+async def getGameStatus(data):
+    room = await asyncRoomStore.findRoom(data["roomCode"], ("gameStarted",))
+
+    if not room:
+        return {"error": "Room not found"}, 404
+
+    return {"message": "Game status found", "gameStarted": room["gameStarted"]}, 200
+
+
+@route("/submitAnswer", guest=True)
+async def submitAnswer(data):
+    questionNumber = int(data["questionNumber"])
+
+    liveRoom = gameState.get(data["roomCode"])
+    if not liveRoom:
+        question = await asyncRoomStore.answerKey(data["roomCode"], questionNumber)
+    elif 1 <= questionNumber <= len(liveRoom.questions):
+        question = liveRoom.questions[questionNumber - 1]
+    else:
+        question = None
+    if not question:
+        return {"error": "Question not found"}, 404
+    # Correctness, points and time all come from the server, not the client
+    elapsed = answerElapsed(
+        answerClock, liveRoom, data["roomCode"], data["userID"], questionNumber
+    )
+    if elapsed is not None and elapsed < 0:
+        # Paced questions can't be answered before their reveal time
+        return {"error": "Question not revealed yet"}, 403
+    isCorrect = data["answer"] == question["correct"]
+    increments = answerIncrements(
+        question, data["answer"], elapsed, Config.Game.MIN_ANSWER_SECONDS
+    )
+
+    if liveRoom:
+        error = gameState.answer(liveRoom, data["userID"], questionNumber, increments)
+    else:
+        error = await asyncRoomStore.recordAnswer(
+            data["roomCode"], data["userID"], questionNumber, increments
+        )
+    if error:
+        return error
+    if liveRoom and gameState.durable:
+        await gameState.commitAsync(liveRoom)
+    answerClock.advance(data["roomCode"], data["userID"], questionNumber)
+    responseCache.bump(data["roomCode"])
+
+    roomEvents.emit(
+        data["roomCode"], "leaderboard", scoreDelta(data["userID"], increments)
+    )
+
+    if liveRoom:
+        questionCount = len(liveRoom.questions)
+    else:
+        questionCount = await asyncRoomStore.questionCount(data["roomCode"])
+
+    return {
+        "message": "Correct answer" if isCorrect else "Incorrect answer",
+        "points": increments.get("points", 0),
+        "status": "next" if questionNumber < questionCount else "end",
+    }, 200
+
+
+@route("/timeoutAnswer", guest=True)
+async def timeoutAnswer(data):
+    questionNumber = int(data["questionNumber"])
+
+    liveRoom = gameState.get(data["roomCode"])
+    if liveRoom:
+        error = gameState.answer(liveRoom, data["userID"], questionNumber, {})
+    else:
+        error = await asyncRoomStore.recordAnswer(
+            data["roomCode"], data["userID"], questionNumber, {}
+        )
+    if error:
+        return error
+    if liveRoom and gameState.durable:
+        await gameState.commitAsync(liveRoom)
+    answerClock.advance(data["roomCode"], data["userID"], questionNumber)
+    responseCache.bump(data["roomCode"])
+
+    return {"message": "Question marked as answered due to timeout"}, 200
+
+
+@route("/leaderboard", cached=("limit", "offset", "userID"))
+async def leaderboard(data):
+    limit = data.get("limit")
+    limit = None if limit is None else int(limit)
+    offset = int(data.get("offset", 0))
+
+    liveRoom = gameState.get(data["roomCode"])
+    if liveRoom:
+        room = {"name": liveRoom.name, "owner": liveRoom.owner}
+        total, leaderboard = gameState.leaderboard(liveRoom, limit, offset)
+        user = None
+        if "userID" in data:
+            user = gameState.rank(liveRoom, data["userID"])
+    else:
+        room = await asyncRoomStore.findRoom(data["roomCode"], ("name", "owner"))
+        archive = None
+        if not room:
+            archive = await asyncRoomStore.archivedRoom(data["roomCode"])
+
+        if archive:
+            room = archive
+            total, leaderboard, user = archivedLeaderboard(
+                archive, limit, offset, data.get("userID")
+            )
+        elif not room:
+            return {"error": "Room not found"}, 404
+        else:
+            ownerName = room["owner"]["name"]
+            total, leaderboard = await asyncRoomStore.leaderboard(
+                data["roomCode"], ownerName, limit, offset
+            )
+            user = None
+            if "userID" in data:
+                user = await asyncRoomStore.rank(
+                    data["roomCode"], ownerName, data["userID"]
+                )
+
+    return {
+        "message": "Leaderboard found",
+        "roomName": room["name"],
+        "leaderboard": leaderboard,
+        "total": total,
+        "user": user,
+        "owner": room["owner"]["email"],
+    }, 200
+
+
+async def readBody(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+async def sendJSON(send, body, status, etag=None, extraHeaders=(), encoding=None):
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+        (b"x-server-time", f"{time():.3f}".encode()),
+        *corsHeaders,
+        *extraHeaders,
+    ]
+    if Config.Compression.ENABLED:
+        headers.append((b"vary", b"Accept-Encoding"))
+    if encoding is not None:
+        headers.append((b"content-encoding", encoding.encode()))
+    if etag is not None:
+        # Compressed copies carry the weak form of the tag
+        weak = "W/" if encoding is not None else ""
+        headers.append((b"etag", f'{weak}"{etag}"'.encode()))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+def header(scope, name):
+    for headerName, value in scope["headers"]:
+        if headerName == name:
+            return value.decode("latin-1")
+    return None
+
+
+def ifNoneMatch(scope):
+    value = header(scope, b"if-none-match")
+    if value is None:
+        return set()
+    return {tag.strip().removeprefix("W/").strip('"') for tag in value.split(",")}
+
+
+async def limitRate(scope, send, path):
+    # Sends the 429 and returns True when the client is over its budget
+    if not Config.RateLimit.ENABLED or path not in Config.RateLimit.BUDGETS:
+        return False
+    client = clientAddress(
+        scope["client"][0] if scope.get("client") else None,
+        header(scope, b"x-forwarded-for"),
+    )
+    tab = tabID(header(scope, b"x-client-id"))
+    wait = rateLimiter.check(client, path, tab)
+    if not wait:
+        return False
+    metrics.rateLimited.inc(path)
+    body = dumps({"error": "Too many requests"})
+    retryAfter = str(max(1, round(wait))).encode()
+    await sendJSON(send, body, 429, extraHeaders=[(b"retry-after", retryAfter)])
+    return True
+
+
+async def guestDenied(scope, data):
+    # Like guestDenied in server.py, the store is only asked without a token
+    claims = guestClaims(header(scope, b"authorization"))
+    if claims is None:
+        isGuest = liveGuest(gameState.get(data["roomCode"]), data["userID"])
+        if isGuest is None:
+            isGuest = await asyncRoomStore.isGuest(data["roomCode"], data["userID"])
+        if not isGuest:
+            return None
+    return guestError(claims, data["roomCode"], data["userID"])
+
+
+async def handle(scope, path, handler, data):
+    # Returns the serialized body, the status, and the ETag and cache key when
+    # cacheable
+    if not Config.Cache.ENABLED or path not in cachedFields or "roomCode" not in data:
+        payload, status = await handler(data)
+        return dumps(payload), status, None, None
+
+    fields, questionsOnly = cachedFields[path]
+    key, etag = responseCache.key(
+        path,
+        data["roomCode"],
+        tuple(data.get(field) for field in fields),
+        questionsOnly,
+    )
+    if etag in ifNoneMatch(scope):
+        metrics.responseCacheResults.inc(path, "notModified")
+        return b"", 304, etag, None
+
+    body = responseCache.get(key)
+    if body is not None:
+        metrics.responseCacheResults.inc(path, "hit")
+        return body, 200, etag, key
+
+    async def render():
+        payload, status = await handler(data)
+        body = dumps(payload)
+        if status == 200:
+            responseCache.put(key, body)
+        return body, status
+
+    (body, status), shared = await renders.do(key, render)
+    metrics.responseCacheResults.inc(path, "coalesced" if shared else "miss")
+    if status != 200:
+        return body, status, None, None
+    return body, status, etag, key
+
+
+async def streamEvents(receive, send, roomCode):
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/event-stream"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no"),
+                *corsHeaders,
+            ],
+        }
+    )
+    # uvicorn's send returns quietly once the client is gone, only receive
+    # tells, so the stream runs until the disconnect arrives
+    pumping = asyncio.ensure_future(pumpEvents(send, roomCode))
+    disconnected = asyncio.ensure_future(waitForDisconnect(receive))
+    await asyncio.wait({pumping, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+    disconnected.cancel()
+    pumping.cancel()
+    try:
+        await pumping
+    except (asyncio.CancelledError, OSError):
+        pass
+
+
+async def pumpEvents(send, roomCode):
+    events = roomEvents.streamAsync(roomCode)
+    try:
+        async for chunk in events:
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": chunk.encode("utf-8"),
+                    "more_body": True,
+                }
+            )
+    finally:
+        # Unsubscribes even when cancelled while sending
+        await events.aclose()
+
+
+async def waitForDisconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            # Write buffered scores and guest records back before the process exits
+            gameState.stop()
+            guestLog.stop()
+            archiver.stop()
+            await closeAsyncClient()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+
+    path = scope["path"]
+    handler = routes.get(path)
+    if scope["type"] == "http" and scope["method"] == "POST" and handler:
+        start = perf_counter()
+        if await limitRate(scope, send, path):
+            return
+        try:
+            data = orjson.loads(await readBody(receive))
+            denied = await guestDenied(scope, data) if path in guestRoutes else None
+            if denied:
+                body, status, etag, key = dumps(denied[0]), denied[1], None, None
+            else:
+                body, status, etag, key = await handle(scope, path, handler, data)
+        except Exception as e:
+            logger.error(e)
+            body, status, etag, key = dumps({"error": str(e)}), 500, None, None
+        encoding = negotiate(header(scope, b"accept-encoding"), len(body))
+        if encoding is not None:
+            if key is not None:
+                body = responseCache.encoded(key, encoding, body, compress)
+            else:
+                body = compress(body, encoding)
+        await sendJSON(send, body, status, etag, encoding=encoding)
+        if Config.Metrics.ENABLED:
+            metrics.requestLatency.observe(perf_counter() - start, path, "POST", status)
+        return
+
+    if scope["type"] == "http" and scope["method"] == "GET":
+        if path.startswith("/events/"):
+            return await streamEvents(receive, send, path[len("/events/") :])
+
+    # CORS preflights and every other route keep going through Flask
+    return await wsgiApp(scope, receive, send)
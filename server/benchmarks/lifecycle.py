@@ -0,0 +1,308 @@
+# Load harness that plays full quiz games against the real routes
+# Run from the server directory:
+#   python3 -m benchmarks.lifecycle --rooms 4 --players 50 --mongomock
+#   python3 -m benchmarks.lifecycle --rooms 4 --players 50 --sqlite
+#   python3 -m benchmarks.lifecycle --uri mongodb://localhost:27017
+#   python3 -m benchmarks.lifecycle --url http://localhost:5000
+import argparse
+import random
+import sys
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+# Questions per /questionWindow call, the server default of current plus 3
+WINDOW = 4
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.samples = {}
+
+    def record(self, route, seconds, error=None):
+        with self.lock:
+            self.latencies[route].append(seconds)
+            if error is not None:
+                self.errors[route] += 1
+                self.samples.setdefault(route, error)
+
+    def report(self, wallTime):
+        total = sum(len(values) for values in self.latencies.values())
+        print(f"{total} requests in {wallTime:.2f}s, {total / wallTime:.1f} req/s")
+        print(
+            f"{'route':<16}{'count':>8}{'errors':>8}"
+            f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        )
+        for route, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            print(
+                f"{route:<16}{len(values):>8}{self.errors[route]:>8}"
+                f"{percentile(values, 50):>10.2f}"
+                f"{percentile(values, 95):>10.2f}"
+                f"{percentile(values, 99):>10.2f}"
+            )
+        for route, error in sorted(self.samples.items()):
+            print(f"first {route} error: {error}")
+        return sum(self.errors.values())
+
+
+def percentile(values, percent):
+    index = min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))
+    return values[index] * 1000
+
+
+def clientHeaders(token=None, client=None):
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    if client:
+        # client is (address, tab): each room is a classroom behind one NAT
+        # address, X-Forwarded-For is honoured for requests from loopback like
+        # the cluster router's, and every tab sends its own id
+        address, tab = client
+        headers["X-Forwarded-For"] = address
+        headers["X-Client-ID"] = tab
+    return headers
+
+
+class LocalClient:
+    # Calls the Flask app in process, one test client per thread
+    def __init__(self, app, serial=False):
+        self.app = app
+        self.local = threading.local()
+        # mongomock isn't thread safe, its find() edits the projection it is given
+        self.lock = threading.Lock() if serial else None
+
+    def post(self, path, body, token=None, client=None):
+        if not hasattr(self.local, "client"):
+            self.local.client = self.app.test_client()
+        headers = clientHeaders(token, client)
+        if self.lock is None:
+            response = self.local.client.post(path, json=body, headers=headers)
+        else:
+            with self.lock:
+                response = self.local.client.post(path, json=body, headers=headers)
+        return response.status_code, response.get_json()
+
+
+class HTTPClient:
+    def __init__(self, url):
+        import requests
+
+        self.url = url.rstrip("/")
+        self.local = threading.local()
+        self.requests = requests
+
+    def post(self, path, body, token=None, client=None):
+        if not hasattr(self.local, "session"):
+            self.local.session = self.requests.Session()
+        headers = clientHeaders(token, client)
+        response = self.local.session.post(self.url + path, json=body, headers=headers)
+        return response.status_code, response.json()
+
+
+class Harness:
+    def __init__(self, client, stats, pool):
+        self.client = client
+        self.stats = stats
+        self.pool = pool
+
+    def call(self, path, body, token=None, client=None):
+        start = perf_counter()
+        try:
+            status, payload = self.client.post(path, body, token, client)
+        except Exception as e:
+            status, payload = 599, {"error": str(e)}
+        error = None if status < 400 else f"{status} {payload}"
+        self.stats.record(path.strip("/"), perf_counter() - start, error)
+        return status, payload
+
+    def register(self, name, email):
+        self.call("/addUser", {"name": name, "email": email, "password": "password"})
+        status, payload = self.call("/login", {"email": email, "password": "password"})
+        if status != 200:
+            raise RuntimeError(f"Login failed for {email}: {payload}")
+        return payload["user"]["id"], payload["accessToken"]
+
+    def playRoom(self, roomIndex, players, questions, registered, polls):
+        runID = random.getrandbits(32)
+        ownerName = f"Owner {roomIndex}"
+        ownerEmail = f"owner{roomIndex}.{runID}@bench.app"
+        _, ownerToken = self.register(ownerName, ownerEmail)
+
+        _, payload = self.call(
+            "/createRoom",
+            {"name": f"Room {roomIndex}", "userName": ownerName, "email": ownerEmail},
+            ownerToken,
+        )
+        roomCode = payload["room"]["code"]
+
+        for number in range(questions):
+            self.call(
+                "/addQuestion",
+                {
+                    "roomCode": roomCode,
+                    "question": f"Question {number}?",
+                    "answers": {"a": "1", "b": "2", "c": "3", "d": "4"},
+                    "correct": "a",
+                    "point": 10,
+                    "time": 15,
+                },
+                ownerToken,
+            )
+
+        def join(playerIndex):
+            name = f"Player {roomIndex}.{playerIndex}"
+            if playerIndex < registered:
+                email = f"player{roomIndex}.{playerIndex}.{runID}@bench.app"
+                userID, token = self.register(name, email)
+                self.call(
+                    "/joinRoom",
+                    {
+                        "roomCode": roomCode,
+                        "userID": userID,
+                        "name": name,
+                        "email": email,
+                    },
+                    token,
+                )
+                return userID, token
+            _, payload = self.call("/joinGuest", {"roomCode": roomCode, "name": name})
+            # Guests answer with the token that vouches for their id
+            return payload["room"]["guest"]["id"], payload["room"]["guest"]["token"]
+
+        joined = list(self.pool.map(join, range(players)))
+        self.call("/loadUsers", {"roomCode": roomCode}, ownerToken)
+        self.call("/startGame", {"roomCode": roomCode}, ownerToken)
+
+        def answer(userID, token, number):
+            # Like the game client, one window request covers the next few questions
+            if (number - 1) % WINDOW == 0:
+                self.call("/questionWindow", {"roomCode": roomCode, "from": number})
+            if random.random() < 0.1:
+                self.call(
+                    "/timeoutAnswer",
+                    {"roomCode": roomCode, "userID": userID, "questionNumber": number},
+                    token,
+                )
+                return
+            self.call(
+                "/submitAnswer",
+                {
+                    "roomCode": roomCode,
+                    "userID": userID,
+                    "questionNumber": number,
+                    "answer": random.choice("abcd"),
+                },
+                token,
+            )
+
+        for number in range(1, questions + 1):
+            # Every player answers at once, like when a question's timer runs out
+            burst = [
+                self.pool.submit(answer, userID, token, number)
+                for userID, token in joined
+            ]
+            burst += [
+                self.pool.submit(
+                    self.call,
+                    "/leaderboard",
+                    {"roomCode": roomCode},
+                    client=(f"10.0.{roomIndex}.1", f"tab-{number}-{poll}"),
+                )
+                for poll in range(polls)
+            ]
+            for future in burst:
+                future.result()
+
+        self.call("/endGame", {"roomCode": roomCode}, ownerToken)
+        self.call("/leaderboard", {"roomCode": roomCode})
+
+
+def buildClient(arguments):
+    if arguments.url:
+        return HTTPClient(arguments.url)
+
+    import utils.database as database
+    from config import Config
+
+    Config.Hashing.ROUNDS = arguments.rounds
+    Config.Game.ANSWER_DURABILITY = arguments.durability
+    if arguments.mongomock:
+        import mongomock
+
+        mockClient = mongomock.MongoClient()
+        database.getClient = lambda: mockClient
+    elif arguments.sqlite:
+        Config.Storage.BACKEND = "sqlite"
+        Config.Storage.SQLITE_PATH = ":memory:"
+    elif arguments.uri:
+        database.uri = arguments.uri
+
+    from server import app
+
+    return LocalClient(app, serial=arguments.mongomock)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quiz lifecycle load test")
+    parser.add_argument("--rooms", type=int, default=4)
+    parser.add_argument("--players", type=int, default=50)
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument(
+        "--registered", type=int, default=2, help="players per room with accounts"
+    )
+    parser.add_argument(
+        "--polls", type=int, default=5, help="leaderboard polls per question"
+    )
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--rounds", type=int, default=4, help="bcrypt cost for in-process runs"
+    )
+    parser.add_argument(
+        "--durability",
+        choices=("enqueue", "flush"),
+        default="enqueue",
+        help="when in-process runs acknowledge answers",
+    )
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--mongomock", action="store_true")
+    target.add_argument("--sqlite", action="store_true", help="in-memory SQLite")
+    target.add_argument("--uri", help="local mongod, e.g. mongodb://localhost:27017")
+    target.add_argument("--url", help="running server, e.g. http://localhost:5000")
+    arguments = parser.parse_args()
+
+    random.seed(arguments.seed)
+    client = buildClient(arguments)
+    stats = Stats()
+
+    with ThreadPoolExecutor(max_workers=arguments.concurrency) as pool:
+        harness = Harness(client, stats, pool)
+        start = perf_counter()
+        # Rooms run side by side, each on its own thread driving the shared pool
+        with ThreadPoolExecutor(max_workers=arguments.rooms) as rooms:
+            games = [
+                rooms.submit(
+                    harness.playRoom,
+                    roomIndex,
+                    arguments.players,
+                    arguments.questions,
+                    arguments.registered,
+                    arguments.polls,
+                )
+                for roomIndex in range(arguments.rooms)
+            ]
+            for game in games:
+                game.result()
+        wallTime = perf_counter() - start
+
+    errors = stats.report(wallTime)
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# Bytes a room read sends over the wire before and after splitting the room
+# Run from the server directory: python3 -m benchmarks.projectionBytes
+import sys
+import bson
+from utils import projections
+from utils.codeGenerator import generateCode
+from utils.roomStore import SCHEMA_VERSION, answeredSet
+
+QUESTIONS = 500
+MEMBERS = 500
+
+# Upper bound for each projected read, fails the run if a projection regresses
+BUDGETS = {
+    "getGameStatus": 64,
+    "loadUsersRoom": 16 * 1024,
+    "getQuestion": 1024,
+    "leaderboard": 2048,
+}
+
+
+def buildRoom(questions=QUESTIONS, members=MEMBERS):
+    return {
+        "_id": bson.ObjectId(),
+        "name": "Benchmark room",
+        "questions": [
+            {
+                "id": generateCode(length=64),
+                "question": f"Question number {index}?",
+                "answers": {
+                    "a": "First answer",
+                    "b": "Second answer",
+                    "c": "Third answer",
+                    "d": "Fourth answer",
+                },
+                "correct": "a",
+                "point": 10,
+                "time": 15,
+            }
+            for index in range(questions)
+        ],
+        "time": 0,
+        "owner": {"name": "Owner", "email": "owner@app.com"},
+        "members": [
+            {
+                "id": str(bson.ObjectId()),
+                "name": f"Player {index}",
+                "email": f"player{index}@app.com",
+                "points": index,
+                "trueAnswers": questions // 2,
+                "falseAnswers": questions // 2,
+                "answeredQuestions": list(range(1, questions + 1)),
+            }
+            for index in range(members)
+        ],
+        "code": generateCode(),
+        "gameStarted": True,
+    }
+
+
+def splitRoom(room):
+    # The same room after migrating to the questions and memberships collections
+    roomDocument = {
+        key: value for key, value in room.items() if key not in ("questions", "members")
+    }
+    roomDocument.update(
+        {"questionCount": len(room["questions"]), "schemaVersion": SCHEMA_VERSION}
+    )
+    questions = [
+        {"_id": bson.ObjectId(), "roomCode": room["code"], "position": index, **item}
+        for index, item in enumerate(room["questions"], start=1)
+    ]
+    members = [
+        {
+            "_id": bson.ObjectId(),
+            "roomCode": room["code"],
+            "joined": index,
+            **{key: value for key, value in item.items() if key != "answeredQuestions"},
+            "answered": answeredSet(item["answeredQuestions"]),
+        }
+        for index, item in enumerate(room["members"])
+    ]
+    return roomDocument, questions, members
+
+
+def applyProjection(document, projection):
+    # Mirrors the server side projection for the projections in utils.projections
+    if any(value == 0 for field, value in projection.items() if field != "_id"):
+        excluded = {field for field, value in projection.items() if value == 0}
+        return {key: value for key, value in document.items() if key not in excluded}
+    result = {}
+    for field, value in projection.items():
+        if field in document and (value or field != "_id"):
+            result[field] = document[field]
+    return result
+
+
+def projectedBytes(documents, projection):
+    return sum(
+        len(bson.encode(applyProjection(document, projection)))
+        for document in documents
+    )
+
+
+def main():
+    room = buildRoom()
+    fullBytes = len(bson.encode(room))
+    roomDocument, questions, members = splitRoom(room)
+    reads = {
+        "getGameStatus": ([roomDocument], projections.GAME_STATUS),
+        "loadUsersRoom": (members, projections.MEMBER_NAME),
+        "loadUsers": (members, projections.MEMBER),
+        "getQuestions": (questions, projections.QUESTION),
+        "getQuestion": ([questions[QUESTIONS // 2]], projections.QUESTION),
+        "submitAnswer": ([roomDocument], projections.QUESTION_COUNT),
+        "leaderboard": (members[:10], projections.LEADERBOARD_ENTRY),
+    }
+
+    print(f"room with {QUESTIONS} questions and {MEMBERS} members")
+    print(f"{'endpoint':<16}{'full':>12}{'projected':>12}{'saved':>9}")
+    failed = []
+    for endpoint, (documents, projection) in reads.items():
+        readBytes = projectedBytes(documents, projection)
+        saved = 100 * (1 - readBytes / fullBytes)
+        print(f"{endpoint:<16}{fullBytes:>12}{readBytes:>12}{saved:>8.1f}%")
+        if readBytes > BUDGETS.get(endpoint, fullBytes):
+            failed.append(endpoint)
+
+    # Answers and question edits now touch one of these, not the whole room
+    largest = max(
+        len(bson.encode(document)) for document in [roomDocument, *questions, *members]
+    )
+    print(f"largest document: {fullBytes} bytes before, {largest} bytes after")
+
+    if failed:
+        print(f"over budget: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# Bytes and CPU per response for the JSON encoders and compressions
+# Run from the server directory: python3 -m benchmarks.responseEncoding
+import gzip
+import json
+from time import perf_counter
+import brotli
+from config import Config
+from utils.encoding import compress, dumps
+from utils.leaderboard import leaderboardEntry
+from benchmarks.projectionBytes import buildRoom
+
+QUESTIONS = 50
+MEMBERS = 300
+REPEATS = 200
+
+
+def perCall(function, repeats=REPEATS):
+    start = perf_counter()
+    for _ in range(repeats):
+        result = function()
+    return result, (perf_counter() - start) / repeats * 1e6
+
+
+def responses():
+    room = buildRoom(QUESTIONS, MEMBERS)
+    room.pop("_id")
+    fullRoom = {
+        "name": room["name"],
+        "members": room["members"],
+        "questions": room["questions"],
+        "code": room["code"],
+    }
+    question = room["questions"][0]
+    return {
+        "getRoom": {"message": "Room found", "room": fullRoom},
+        "loadUsers": {"message": "Users found", "users": room["members"]},
+        "leaderboard": {
+            "message": "Leaderboard found",
+            "roomName": room["name"],
+            "leaderboard": [leaderboardEntry(member) for member in room["members"]],
+            "total": MEMBERS,
+            "user": None,
+            "owner": room["owner"]["email"],
+        },
+        # Mutations used to echo the whole room back
+        "addQuestion before": {"message": "Question added", "room": fullRoom},
+        "addQuestion after": {
+            "message": "Question added",
+            "room": {"code": room["code"]},
+            "question": question,
+        },
+        "startGame before": {"message": "Game started", "room": fullRoom},
+        "startGame after": {
+            "message": "Game started",
+            "room": {"code": room["code"], "gameStarted": True, "schedule": None},
+        },
+    }
+
+
+def main():
+    print(f"room with {QUESTIONS} questions and {MEMBERS} members, times per call")
+    print(
+        f"{'response':<20}{'json us':>9}{'orjson us':>11}{'bytes':>9}"
+        f"{'gzip':>8}{'gzip us':>9}{'br':>8}{'br us':>8}"
+    )
+    for name, payload in responses().items():
+        # Flask's default provider sorts keys
+        _, jsonTime = perCall(lambda: json.dumps(payload, sort_keys=True).encode())
+        body, orjsonTime = perCall(lambda: dumps(payload))
+        gzipped, gzipTime = perCall(lambda: compress(body, "gzip"))
+        brotlied, brotliTime = perCall(lambda: compress(body, "br"))
+        assert gzip.decompress(gzipped) == body == brotli.decompress(brotlied)
+        print(
+            f"{name:<20}{jsonTime:>9.1f}{orjsonTime:>11.1f}{len(body):>9}"
+            f"{len(gzipped):>8}{gzipTime:>9.1f}{len(brotlied):>8}{brotliTime:>8.1f}"
+        )
+    print(
+        f"gzip level {Config.Compression.GZIP_LEVEL}, brotli quality "
+        f"{Config.Compression.BROTLI_QUALITY}, bodies under "
+        f"{Config.Compression.MIN_BYTES} bytes go out uncompressed"
+    )
+
+
+if __name__ == "__main__":
+    main()
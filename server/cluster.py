@@ -0,0 +1,86 @@
+# Production entry point: python3 cluster.py [--workers N] [--port 5000]
+# Runs N uvicorn processes serving asgi:app and a router in front of them that
+# sends every request for a room to the same worker. Live games, response
+# caches, answer timing and event streams are per process, so a room has to
+# stay on one worker; different rooms spread across all of them
+import argparse
+import logging
+import subprocess
+import sys
+import threading
+import uvicorn
+from config import Config
+from utils.roomRouter import RoomRouter
+
+logger = logging.getLogger("cluster")
+
+
+class Workers:
+    def __init__(self, ports):
+        self.ports = ports
+        self.processes = {}
+        self.stopped = threading.Event()
+
+    def spawn(self, port):
+        # A long keep-alive lets the router reuse its connections to the worker
+        self.processes[port] = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "uvicorn",
+                "asgi:app",
+                "--host",
+                "127.0.0.1",
+                "--port",
+                str(port),
+                "--timeout-keep-alive",
+                "75",
+                "--no-access-log",
+            ]
+        )
+
+    def start(self):
+        for port in self.ports:
+            self.spawn(port)
+        threading.Thread(target=self.supervise, daemon=True).start()
+
+    def supervise(self):
+        # Restart workers that exit, their rooms come back on the same port
+        while not self.stopped.wait(1):
+            for port, process in list(self.processes.items()):
+                if process.poll() is not None and not self.stopped.is_set():
+                    logger.error(f"Worker on port {port} exited, restarting")
+                    self.spawn(port)
+
+    def stop(self):
+        # Workers flush live scores on shutdown, wait for them
+        self.stopped.set()
+        for process in self.processes.values():
+            process.terminate()
+        for process in self.processes.values():
+            process.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=Config.Cluster.WORKERS)
+    parser.add_argument("--host", default=Config.Cluster.HOST)
+    parser.add_argument("--port", type=int, default=Config.Cluster.PORT)
+    parser.add_argument("--worker-port", type=int, default=Config.Cluster.WORKER_PORT)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    ports = [args.worker_port + index for index in range(args.workers)]
+    workers = Workers(ports)
+    workers.start()
+    try:
+        uvicorn.run(
+            RoomRouter(ports),
+            host=args.host,
+            port=args.port,
+            lifespan="off",
+            server_header=False,
+            date_header=False,
+        )
+    finally:
+        workers.stop()
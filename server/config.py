@@ -2,6 +2,130 @@ class Config:
     SECRET_KEY = "secretkey"
     HOST = "192.168.1.100"
 
+    class Storage:
+        # "mongo", or "sqlite" for a single node with an embedded database file,
+        # SQLITE_PATH ":memory:" keeps everything in the process
+        BACKEND = "mongo"
+        SQLITE_PATH = "quiz.db"
+
     class Mongo:
         USERNAME = "<MONGO_USERNAME>"
         PASSWORD = "<MONGO_PASSWORD>"
+        DATABASE = "app"
+        # Connection pool shared by every route
+        MAX_POOL_SIZE = 100
+        MIN_POOL_SIZE = 0
+        MAX_IDLE_TIME_MS = 60000
+        WAIT_QUEUE_TIMEOUT_MS = 5000
+        # Create the collection indexes when the app starts
+        CREATE_INDEXES = True
+
+    class Questions:
+        # Largest question bank accepted by /importQuestions in one upload
+        MAX_IMPORT = 1000
+
+    class Hashing:
+        # bcrypt cost factor, stored hashes with another cost are redone on login
+        ROUNDS = 12
+        WORKERS = 4
+        # Requests allowed to wait for a worker before answering 429
+        QUEUE_SIZE = 32
+
+    class Auth:
+        # Token blocklist lookups cached per process, misses are rechecked after
+        # BLOCKLIST_CACHE_SECONDS so logouts elsewhere apply within that time
+        BLOCKLIST_CACHE_SECONDS = 30
+        BLOCKLIST_CACHE_ENTRIES = 65536
+
+    class Guests:
+        # Guest records are written behind the join in batches of up to
+        # BATCH_SIZE, at least every FLUSH_INTERVAL_SECONDS
+        FLUSH_INTERVAL_SECONDS = 5
+        BATCH_SIZE = 500
+        TOKEN_HOURS = 24
+
+    class RateLimit:
+        # Token buckets per browser tab on the routes every open tab polls,
+        # (requests per second, burst) by route. Tabs send an id in X-Client-ID,
+        # all tabs behind one address share TABS_PER_ADDRESS times the budget
+        ENABLED = True
+        BUDGETS = {
+            "/getGameStatus": (2, 10),
+            "/loadUsersRoom": (2, 10),
+            "/loadUsers": (2, 10),
+            "/leaderboard": (2, 10),
+        }
+        TABS_PER_ADDRESS = 64
+        MAX_CLIENTS = 65536
+
+    class Async:
+        # uvicorn asgi:app hands the routes it doesn't serve itself to Flask on
+        # this many threads
+        WSGI_THREADS = 32
+
+    class Cluster:
+        # python3 cluster.py: a room affinity router on PORT in front of WORKERS
+        # uvicorn processes listening on WORKER_PORT and up, on loopback
+        HOST = "0.0.0.0"
+        PORT = 5000
+        WORKERS = 4
+        WORKER_PORT = 5100
+
+    class Rooms:
+        CODE_LENGTH = 6
+        # Retries when a generated room code is already taken
+        CODE_ATTEMPTS = 5
+        # Every SWEEP_INTERVAL_SECONDS (0 turns it off) ended games older than
+        # ARCHIVE_AFTER_SECONDS and played rooms idle for IDLE_EXPIRE_SECONDS move
+        # to archivedRooms, idle rooms that never got questions or ran a game
+        # are deleted. Archives expire after ARCHIVE_TTL_SECONDS, None keeps them
+        SWEEP_INTERVAL_SECONDS = 300
+        SWEEP_BATCH = 100
+        ARCHIVE_AFTER_SECONDS = 3600
+        IDLE_EXPIRE_SECONDS = 7 * 24 * 3600
+        ARCHIVE_TTL_SECONDS = 365 * 24 * 3600
+
+    class Events:
+        # "local" publishes from the routes, "changeStream" from a rooms watch
+        SOURCE = "local"
+        QUEUE_SIZE = 256
+        HEARTBEAT_SECONDS = 15
+
+    class Metrics:
+        ENABLED = True
+        # Size one in N Mongo commands for the document bytes counters
+        BYTES_SAMPLE_EVERY = 16
+
+    class Game:
+        # Seconds between write-behind flushes of live scores to Mongo
+        FLUSH_INTERVAL_SECONDS = 2
+        # Seconds between retries of an ended game's failed final write, also
+        # when FLUSH_INTERVAL_SECONDS is 0
+        RETRY_INTERVAL_SECONDS = 5
+        # "enqueue" acknowledges an answer once the live game has it, "flush"
+        # once it is written. Answers arriving within COMMIT_DELAY_MS of each
+        # other share one bulk write per room
+        ANSWER_DURABILITY = "enqueue"
+        COMMIT_DELAY_MS = 5
+        COMMIT_TIMEOUT_SECONDS = 5
+        # Questions /questionWindow sends after the current one, and its upper bound
+        WINDOW_AHEAD = 3
+        MAX_WINDOW_AHEAD = 20
+        # Paced games reveal questions on a server schedule instead of per player
+        PACED = False
+        REVEAL_GAP_SECONDS = 3
+        # Floor on the server measured answer time, faster answers score as this
+        MIN_ANSWER_SECONDS = 1
+
+    class Compression:
+        # JSON bodies of at least MIN_BYTES go out brotli or gzip encoded when the
+        # client accepts it, cached responses keep their encoded copies
+        ENABLED = True
+        MIN_BYTES = 1024
+        BROTLI_QUALITY = 4
+        GZIP_LEVEL = 6
+
+    class Cache:
+        # Serialized read responses kept per room version, least recently used go
+        ENABLED = True
+        MAX_ENTRIES = 4096
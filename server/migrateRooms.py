@@ -0,0 +1,9 @@
+# Moves questions and members of every legacy room into their own collections
+# Rooms also migrate lazily on first read, this just does it up front
+from utils.database import ensureIndexes, getDatabase
+from utils.roomStore import RoomStore
+
+if __name__ == "__main__":
+    ensureIndexes()
+    migrated = RoomStore(getDatabase).migrateAll()
+    print(f"Migrated {migrated} rooms")
@@ -0,0 +1,61 @@
+from time import time
+import pytest
+from utils.archive import RoomArchiver
+from utils.sqliteStore import SqliteStore
+
+DAY = 24 * 3600
+OWNER = {"name": "Owner", "email": "owner@example.com"}
+
+
+@pytest.fixture
+def store():
+    return SqliteStore(":memory:")
+
+
+def archiver(store):
+    return RoomArchiver(store, archiveAfter=3600, idleAfter=7 * DAY)
+
+
+def question(number):
+    return {
+        "id": f"q{number}",
+        "question": f"Question {number}",
+        "answers": {"a": "1", "b": "2", "c": "3", "d": "4"},
+        "correct": "a",
+        "point": 10,
+        "time": 15,
+    }
+
+
+def backdate(store, roomCode, seconds):
+    store.execute(
+        "UPDATE rooms SET activeAt = activeAt - ? WHERE code = ?", (seconds, roomCode)
+    )
+
+
+def test_question_writes_keep_a_room_active(store):
+    store.createRoom("PREP01", "Prepared", OWNER)
+    backdate(store, "PREP01", 8 * DAY)
+    store.addQuestions("PREP01", [question(1)])
+
+    assert archiver(store).sweep() == (0, 0)
+    assert store.findRoom("PREP01")
+
+
+def test_joins_keep_a_room_active(store):
+    store.createRoom("JOIN01", "Joined", OWNER)
+    backdate(store, "JOIN01", 8 * DAY)
+    store.addMember("JOIN01", {"id": "p1", "name": "Player", "email": "p1@x"})
+
+    assert archiver(store).sweep() == (0, 0)
+
+
+def test_idle_room_with_questions_is_archived_not_deleted(store):
+    store.createRoom("IDLE01", "Questions", OWNER)
+    store.addQuestions("IDLE01", [question(1), question(2)])
+    store.createRoom("IDLE02", "Empty", OWNER)
+
+    assert archiver(store).sweep(now=time() + 8 * DAY) == (1, 1)
+    assert store.findRoom("IDLE01") is None
+    assert store.archivedRoom("IDLE01")["name"] == "Questions"
+    assert store.archivedRoom("IDLE02") is None
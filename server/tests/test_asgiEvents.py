@@ -0,0 +1,40 @@
+import asyncio
+from config import Config
+
+Config.Storage.BACKEND = "sqlite"
+Config.Storage.SQLITE_PATH = ":memory:"
+
+import asgi  # noqa: E402
+
+
+def test_event_stream_ends_and_unsubscribes_on_disconnect():
+    async def run():
+        gone = asyncio.Event()
+        requested = False
+        messages = []
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await gone.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            # Like uvicorn, sending after the client left doesn't raise
+            messages.append(message)
+
+        scope = {"type": "http", "method": "GET", "path": "/events/ABC", "headers": []}
+        streaming = asyncio.ensure_future(asgi.app(scope, receive, send))
+        while len(messages) < 2:
+            await asyncio.sleep(0.01)
+        subscribed = asgi.roomEvents.subscriberCount("ABC")
+        gone.set()
+        await asyncio.wait_for(streaming, 5)
+        return subscribed, asgi.roomEvents.subscriberCount("ABC"), messages
+
+    subscribed, remaining, messages = asyncio.run(run())
+    assert subscribed == 1
+    assert remaining == 0
+    assert messages[1]["body"] == b"retry: 3000\n\n"
@@ -0,0 +1,113 @@
+from threading import Event, Thread
+from time import sleep
+import pytest
+from utils.gameState import GameStateEngine
+
+
+class BlockingStore:
+    # writeScores waits for release, raising once if failNext is set
+    def __init__(self):
+        self.writing = Event()
+        self.release = Event()
+        self.failNext = False
+        self.written = []
+
+    def writeScores(self, roomCode, members):
+        self.writing.set()
+        self.release.wait(5)
+        if self.failNext:
+            self.failNext = False
+            raise RuntimeError("write failed")
+        self.written.append((roomCode, members))
+
+
+def room(code="ROOM01"):
+    return {
+        "code": code,
+        "name": "Room",
+        "owner": {"name": "Owner", "email": "owner@example.com"},
+        "questions": [{"question": "q", "time": 10, "point": 10}],
+        "members": [
+            {"name": "Owner", "email": "owner@example.com"},
+            {"id": "p1", "name": "Player", "email": "p1@example.com"},
+        ],
+    }
+
+
+def engine(store):
+    return GameStateEngine(store, flushInterval=0)
+
+
+def test_answers_during_drain_are_refused():
+    store = BlockingStore()
+    gameState = engine(store)
+    gameState.start("ROOM01", room())
+
+    ending = Thread(target=gameState.end, args=("ROOM01",))
+    ending.start()
+    assert store.writing.wait(5)
+
+    # The room is still registered while its final write is running
+    liveRoom = gameState.get("ROOM01")
+    assert liveRoom is not None
+    assert gameState.answer(liveRoom, "p1", 1, {"points": 10}) == (
+        {"error": "Game has ended"},
+        409,
+    )
+
+    store.release.set()
+    ending.join(5)
+    assert gameState.get("ROOM01") is None
+    assert len(store.written) == 1
+
+
+def test_failed_drain_keeps_room_live():
+    store = BlockingStore()
+    store.failNext = True
+    store.release.set()
+    gameState = engine(store)
+    gameState.start("ROOM01", room())
+
+    with pytest.raises(RuntimeError):
+        gameState.end("ROOM01")
+    liveRoom = gameState.get("ROOM01")
+    assert liveRoom is not None and liveRoom.ended
+
+    gameState.flush("ROOM01")
+    assert store.written[0][1][0]["id"] == "p1"
+    # and leaves once the retried write is stored
+    assert gameState.get("ROOM01") is None
+
+
+def test_failed_drain_is_retried_without_periodic_flushes():
+    store = BlockingStore()
+    store.failNext = True
+    store.release.set()
+    gameState = GameStateEngine(store, flushInterval=0, retryInterval=0.05)
+    gameState.start("ROOM01", room())
+    try:
+        with pytest.raises(RuntimeError):
+            gameState.end("ROOM01")
+
+        for _ in range(100):
+            if gameState.get("ROOM01") is None:
+                break
+            sleep(0.05)
+        assert gameState.get("ROOM01") is None
+        assert store.written[0][1][0]["id"] == "p1"
+        # so the next game can start
+        assert not gameState.start("ROOM01", room()).ended
+    finally:
+        gameState.stop()
+
+
+def test_starting_a_live_game_keeps_it():
+    store = BlockingStore()
+    store.release.set()
+    gameState = engine(store)
+    liveRoom = gameState.start("ROOM01", room())
+    gameState.answer(liveRoom, "p1", 1, {"points": 10})
+
+    assert gameState.start("ROOM01", room()) is liveRoom
+    assert liveRoom.members["p1"].points == 10
+    assert liveRoom.members["p1"].answered == {1}
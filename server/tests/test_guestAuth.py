@@ -0,0 +1,33 @@
+from datetime import timedelta
+import jwt
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from config import Config
+from utils.guestAuth import guestClaims, guestError
+
+
+def token(identity, **claims):
+    app = Flask(__name__)
+    app.config["JWT_SECRET_KEY"] = Config.SECRET_KEY
+    JWTManager(app)
+    with app.app_context():
+        return create_access_token(
+            identity=identity,
+            additional_claims=claims,
+            expires_delta=timedelta(hours=1),
+        )
+
+
+def test_guest_token_must_match_id_and_room():
+    claims = guestClaims("Bearer " + token("g1", guest=True, roomCode="ROOM01"))
+    assert guestError(claims, "ROOM01", "g1") is None
+    assert guestError(claims, "ROOM01", "g2")[1] == 403
+    assert guestError(claims, "ROOM02", "g1")[1] == 403
+
+
+def test_only_valid_guest_tokens_count():
+    assert guestClaims(None) is None
+    assert guestClaims("Bearer " + token("u1")) is None
+    forged = jwt.encode({"sub": "g1", "guest": True}, "other", algorithm="HS256")
+    assert guestClaims("Bearer " + forged) is None
+    assert guestError(None, "ROOM01", "g1")[1] == 401
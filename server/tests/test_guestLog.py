@@ -0,0 +1,31 @@
+import pytest
+from utils.guestLog import GuestLog
+
+
+class FlakyStore:
+    def __init__(self, failures):
+        self.failures = failures
+        self.batches = []
+
+    def addGuests(self, guests):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("write failed")
+        self.batches.append([guest["id"] for guest in guests])
+
+
+def test_failed_batches_are_kept_for_the_next_flush():
+    store = FlakyStore(failures=1)
+    guestLog = GuestLog(store, flushInterval=5, maxBatch=2)
+    # Recorded straight into pending, without the flusher thread
+    guestLog.ensureFlusher = lambda: None
+    for guestID in ("g1", "g2", "g3"):
+        guestLog.record(guestID, guestID)
+
+    with pytest.raises(RuntimeError):
+        guestLog.flush()
+    guestLog.record("g4", "g4")
+    guestLog.flush()
+
+    assert store.batches == [["g1", "g2"], ["g3", "g4"]]
+    assert guestLog.pending == []
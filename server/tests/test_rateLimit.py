@@ -0,0 +1,40 @@
+from utils.rateLimit import RateLimiter, clientAddress, tabID
+
+BUDGETS = {"/loadUsersRoom": (2, 10)}
+
+
+def test_classroom_behind_one_address_is_not_throttled():
+    limiter = RateLimiter(BUDGETS, tabsPerAddress=64)
+    waits = [limiter.check("10.0.0.1", "/loadUsersRoom", f"tab{n}") for n in range(30)]
+    assert not any(waits)
+
+
+def test_each_tab_keeps_its_own_budget():
+    limiter = RateLimiter(BUDGETS, tabsPerAddress=64)
+    waits = [limiter.check("10.0.0.1", "/loadUsersRoom", "tab") for _ in range(11)]
+    assert not any(waits[:10])
+    assert waits[10] > 0
+    # Other tabs at the same address aren't held back by it
+    assert not limiter.check("10.0.0.1", "/loadUsersRoom", "other")
+
+
+def test_address_caps_all_its_tabs():
+    limiter = RateLimiter(BUDGETS, tabsPerAddress=2)
+    waits = [limiter.check("10.0.0.1", "/loadUsersRoom", f"tab{n}") for n in range(21)]
+    assert not any(waits[:20])
+    assert waits[20] > 0
+
+
+def test_clients_without_a_tab_id_share_one_budget():
+    limiter = RateLimiter(BUDGETS)
+    waits = [limiter.check("10.0.0.1", "/loadUsersRoom") for _ in range(11)]
+    assert waits[10] > 0
+    assert not limiter.check("10.0.0.2", "/loadUsersRoom")
+
+
+def test_unlimited_routes_and_headers():
+    assert RateLimiter(BUDGETS).check("10.0.0.1", "/login") == 0
+    assert clientAddress("127.0.0.1", "1.2.3.4, 10.0.0.9") == "10.0.0.9"
+    assert clientAddress("8.8.8.8", "10.0.0.9") == "8.8.8.8"
+    assert tabID("x" * 65) is None
+    assert tabID("tab-1") == "tab-1"
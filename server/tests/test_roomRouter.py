@@ -0,0 +1,283 @@
+import asyncio
+import json
+import h11
+from utils.roomRouter import RoomRouter, roomCodeOf
+
+
+class StubWorker:
+    # A worker on loopback answering every request with the port and what it
+    # was sent. closeAfter drops the connection after that many responses
+    # without telling the client, like a keep-alive timeout does
+    def __init__(self, closeAfter=None, stream=None):
+        self.closeAfter = closeAfter
+        self.stream = stream
+        self.connections = 0
+        self.requests = []
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.serve, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def serve(self, reader, writer):
+        self.connections += 1
+        http = h11.Connection(h11.SERVER)
+        responses = 0
+        try:
+            while True:
+                request, body = await self.read(http, reader)
+                if request is None:
+                    return
+                self.requests.append((request, body))
+                if self.stream is not None:
+                    await self.stream(http, writer)
+                else:
+                    self.respond(http, writer, request, body)
+                await writer.drain()
+                responses += 1
+                if responses == self.closeAfter:
+                    return
+                http.start_next_cycle()
+        finally:
+            writer.close()
+
+    async def read(self, http, reader):
+        request, body = None, b""
+        while True:
+            event = http.next_event()
+            if event is h11.NEED_DATA:
+                http.receive_data(await reader.read(65536))
+            elif isinstance(event, h11.Request):
+                request = event
+            elif isinstance(event, h11.Data):
+                body += event.data
+            elif isinstance(event, h11.EndOfMessage):
+                return request, body
+            elif isinstance(event, h11.ConnectionClosed):
+                return None, b""
+
+    def respond(self, http, writer, request, body):
+        headers = dict(request.headers)
+        payload = json.dumps(
+            {
+                "port": self.port,
+                "target": request.target.decode(),
+                "forwardedFor": headers.get(b"x-forwarded-for", b"").decode(),
+            }
+        ).encode()
+        writer.write(
+            http.send(
+                h11.Response(
+                    status_code=200,
+                    headers=[
+                        (b"content-type", b"application/json"),
+                        (b"content-length", str(len(payload)).encode()),
+                    ],
+                )
+            )
+        )
+        writer.write(http.send(h11.Data(data=payload)))
+        writer.write(http.send(h11.EndOfMessage()))
+
+
+def scope(path="/", query=b"", client=("10.0.0.7", 50000), headers=()):
+    return {
+        "type": "http",
+        "method": "POST",
+        "path": path,
+        "query_string": query,
+        "headers": [(b"host", b"quiz"), *headers],
+        "client": client,
+    }
+
+
+async def request(router, requestScope, body=b""):
+    # The router's response messages, the client stays until the response ends
+    messages = []
+    delivered = False
+
+    async def receive():
+        nonlocal delivered
+        if not delivered:
+            delivered = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        messages.append(message)
+
+    await router(requestScope, receive, send)
+    return messages
+
+
+def response(messages):
+    status = messages[0]["status"]
+    body = b"".join(message.get("body", b"") for message in messages[1:])
+    return status, json.loads(body) if body else None
+
+
+def roomRequest(roomCode):
+    return scope("/submitAnswer"), json.dumps({"roomCode": roomCode}).encode()
+
+
+async def workers(count, **options):
+    return [await StubWorker(**options).start() for _ in range(count)]
+
+
+def test_room_code_comes_from_path_query_or_body():
+    assert roomCodeOf(scope("/events/ABC123"), b"") == "ABC123"
+    assert roomCodeOf(scope(query=b"roomCode=QRY456"), b"") == "QRY456"
+    assert roomCodeOf(scope(), b'{"roomCode": "JSN789"}') == "JSN789"
+    form = b'--x\r\nContent-Disposition: form-data; name="roomCode"\r\n\r\nFRM012\r\n'
+    assert roomCodeOf(scope(), form) == "FRM012"
+    assert roomCodeOf(scope(), b'{"roomCode": 5}') is None
+    assert roomCodeOf(scope(), b"{broken") is None
+    assert roomCodeOf(scope("/login"), b'{"email": "a@x"}') is None
+
+
+def test_requests_for_a_room_stay_on_one_worker():
+    async def run():
+        stubs = await workers(4)
+        router = RoomRouter([stub.port for stub in stubs])
+        try:
+            seen = {}
+            for roomCode in [f"ROOM{n:02}" for n in range(40)]:
+                ports = set()
+                for _ in range(3):
+                    status, payload = response(
+                        await request(router, *roomRequest(roomCode))
+                    )
+                    assert status == 200
+                    ports.add(payload["port"])
+                assert len(ports) == 1
+                seen[roomCode] = ports.pop()
+            return seen, {stub.port for stub in stubs}
+        finally:
+            for stub in stubs:
+                await stub.stop()
+
+    seen, ports = asyncio.run(run())
+    # Different rooms still spread over the workers
+    assert set(seen.values()) == ports
+
+
+def test_requests_without_a_room_go_round_robin():
+    async def run():
+        stubs = await workers(3)
+        router = RoomRouter([stub.port for stub in stubs])
+        try:
+            ports = []
+            for _ in range(6):
+                _, payload = response(await request(router, scope("/login")))
+                ports.append(payload["port"])
+            return ports, [stub.port for stub in stubs]
+        finally:
+            for stub in stubs:
+                await stub.stop()
+
+    ports, expected = asyncio.run(run())
+    assert ports == expected * 2
+
+
+def test_forwarded_for_ends_with_the_address_the_router_saw():
+    async def run():
+        stubs = await workers(1)
+        router = RoomRouter([stubs[0].port])
+        try:
+            headers = [(b"x-forwarded-for", b"1.2.3.4")]
+            return response(
+                await request(router, scope("/login", query=b"a=1", headers=headers))
+            )
+        finally:
+            await stubs[0].stop()
+
+    status, payload = asyncio.run(run())
+    assert status == 200
+    assert payload["target"] == "/login?a=1"
+    assert payload["forwardedFor"] == "1.2.3.4, 10.0.0.7"
+
+
+def test_unreachable_worker_answers_502():
+    async def run():
+        # A port nothing listens on any more
+        stub = await StubWorker().start()
+        await stub.stop()
+        router = RoomRouter([stub.port])
+        return response(await request(router, *roomRequest("ROOM01")))
+
+    assert asyncio.run(run()) == (502, {"error": "Worker unavailable"})
+
+
+def test_stale_keep_alive_connection_is_retried_once():
+    async def run():
+        stub = await StubWorker(closeAfter=1).start()
+        router = RoomRouter([stub.port])
+        try:
+            first = response(await request(router, *roomRequest("ROOM01")))
+            # The router pooled the connection the worker has since closed
+            assert len(router.idle[stub.port]) == 1
+            await asyncio.sleep(0.05)
+            second = response(await request(router, *roomRequest("ROOM01")))
+            return first, second, stub.connections, len(stub.requests)
+        finally:
+            await stub.stop()
+
+    first, second, connections, requests = asyncio.run(run())
+    assert first[0] == second[0] == 200
+    # The retry went out on a new connection and reached the worker once
+    assert connections == 2
+    assert requests == 2
+
+
+def test_event_streams_pass_through_as_they_are_sent():
+    async def run():
+        firstEventSeen = asyncio.Event()
+        clientGone = asyncio.Event()
+
+        async def stream(http, writer):
+            writer.write(
+                http.send(
+                    h11.Response(
+                        status_code=200,
+                        headers=[(b"content-type", b"text/event-stream")],
+                    )
+                )
+            )
+            writer.write(http.send(h11.Data(data=b"event: members\ndata: {}\n\n")))
+            await writer.drain()
+            # The stream stays open until the client leaves
+            await clientGone.wait()
+
+        stub = await StubWorker(stream=stream).start()
+        router = RoomRouter([stub.port])
+        messages = []
+
+        async def receive():
+            if not messages:
+                messages.append(None)
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await firstEventSeen.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            messages.append(message)
+            if message.get("body"):
+                firstEventSeen.set()
+
+        eventScope = dict(scope("/events/ROOM01"), method="GET")
+        try:
+            await asyncio.wait_for(router(eventScope, receive, send), 5)
+        finally:
+            clientGone.set()
+            await stub.stop()
+        return messages[1:]
+
+    messages = asyncio.run(run())
+    assert messages[0]["status"] == 200
+    assert (b"content-type", b"text/event-stream") in messages[0]["headers"]
+    assert messages[1]["body"] == b"event: members\ndata: {}\n\n"
+    assert messages[1]["more_body"] is True
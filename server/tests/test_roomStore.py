@@ -0,0 +1,232 @@
+import mongomock
+import pytest
+from utils.roomStore import SCHEMA_VERSION, TOUCH_AFTER_SECONDS, RoomStore
+from utils.sqliteStore import SqliteStore
+from utils.timestamp import current
+
+OWNER = {"name": "Owner", "email": "owner@example.com"}
+
+
+def question(number):
+    return {
+        "id": f"q{number}",
+        "question": f"Question {number}",
+        "answers": {"a": "1", "b": "2", "c": "3", "d": "4"},
+        "correct": "a",
+        "point": 10,
+        "time": 15,
+    }
+
+
+@pytest.fixture
+def mongoStore():
+    database = mongomock.MongoClient()["app"]
+    return RoomStore(lambda: database)
+
+
+@pytest.fixture(params=["mongomock", "sqlite"])
+def store(request):
+    if request.param == "sqlite":
+        return SqliteStore(":memory:")
+    database = mongomock.MongoClient()["app"]
+    return RoomStore(lambda: database)
+
+
+def setActiveAt(store, roomCode, activeAt):
+    if isinstance(store, SqliteStore):
+        store.execute(
+            "UPDATE rooms SET activeAt = ? WHERE code = ?", (activeAt, roomCode)
+        )
+    else:
+        store.collection("rooms").update_one(
+            {"code": roomCode}, {"$set": {"activeAt": activeAt}}
+        )
+
+
+def activeAt(store, roomCode):
+    if isinstance(store, SqliteStore):
+        rows = store.query("SELECT activeAt FROM rooms WHERE code = ?", (roomCode,))
+        return rows[0]["activeAt"]
+    return store.collection("rooms").find_one({"code": roomCode})["activeAt"]
+
+
+def player(number):
+    return {"id": f"p{number}", "name": f"Player {number}", "email": f"p{number}@x"}
+
+
+def test_migrating_a_split_room_keeps_its_question_count(mongoStore):
+    # Version 2: questions and memberships already split out, members still
+    # list answeredQuestions
+    mongoStore.collection("rooms").insert_one(
+        {
+            "code": "ROOM02",
+            "name": "Split",
+            "owner": OWNER,
+            "time": 1,
+            "gameStarted": False,
+            "schemaVersion": 2,
+            "questionCount": 3,
+        }
+    )
+    mongoStore.collection("questions").insert_many(
+        [
+            {"roomCode": "ROOM02", "position": number, **question(number)}
+            for number in (1, 2, 3)
+        ]
+    )
+    mongoStore.collection("memberships").insert_one(
+        {
+            "roomCode": "ROOM02",
+            "id": "p1",
+            "name": "Player",
+            "email": "p1@x",
+            "points": 10,
+            "trueAnswers": 1,
+            "falseAnswers": 0,
+            "answeredQuestions": [1],
+            "joined": 1,
+        }
+    )
+
+    room = mongoStore.findRoom("ROOM02")
+    stored = mongoStore.collection("rooms").find_one({"code": "ROOM02"})
+    assert stored["schemaVersion"] == SCHEMA_VERSION
+    assert stored["questionCount"] == 3
+    assert room["code"] == "ROOM02"
+    assert mongoStore.recordAnswer("ROOM02", "p1", 1, {"points": 5}) == (
+        {"error": "Question already answered"},
+        403,
+    )
+    assert mongoStore.addQuestions("ROOM02", [question(4)])
+    assert [q["id"] for q in mongoStore.questions("ROOM02")] == ["q1", "q2", "q3", "q4"]
+    assert mongoStore.questionAt("ROOM02", 4)["id"] == "q4"
+
+
+def test_migrating_an_embedded_room_splits_it(mongoStore):
+    mongoStore.collection("rooms").insert_one(
+        {
+            "code": "ROOM01",
+            "name": "Embedded",
+            "owner": OWNER,
+            "time": 1,
+            "gameStarted": False,
+            "questions": [question(1), question(2)],
+            "members": [
+                OWNER,
+                {"id": "p1", "name": "Player", "email": "p1@x", "points": 0},
+            ],
+        }
+    )
+
+    mongoStore.findRoom("ROOM01")
+    stored = mongoStore.collection("rooms").find_one({"code": "ROOM01"})
+    assert stored["questionCount"] == 2
+    assert "questions" not in stored and "members" not in stored
+    assert [q["id"] for q in mongoStore.questions("ROOM01")] == ["q1", "q2"]
+    assert mongoStore.memberNames("ROOM01") == ["Owner", "Player"]
+
+
+def test_migrating_a_room_twice_adds_nothing(mongoStore):
+    # Concurrent requests can both migrate a room read in the legacy shape
+    legacy = {
+        "code": "ROOM07",
+        "name": "Embedded",
+        "owner": OWNER,
+        "time": 1,
+        "gameStarted": False,
+        "questions": [question(1), question(2)],
+        "members": [
+            OWNER,
+            {"id": "p1", "name": "Player", "email": "p1@x", "points": 10},
+            {"id": "p2", "name": "Other", "email": "p2@x", "points": 10},
+        ],
+    }
+    mongoStore.collection("rooms").insert_one(dict(legacy))
+
+    mongoStore.migrateRoom(legacy)
+    assert mongoStore.recordAnswer("ROOM07", "p2", 1, {"points": 5}) is None
+    mongoStore.migrateRoom(legacy)
+
+    assert mongoStore.questionCount("ROOM07") == 2
+    assert [q["id"] for q in mongoStore.questions("ROOM07")] == ["q1", "q2"]
+    assert mongoStore.memberNames("ROOM07") == ["Owner", "Player", "Other"]
+    # The answer recorded between the two runs survives
+    _, entries = mongoStore.leaderboard("ROOM07", OWNER["name"])
+    assert [(entry["id"], entry["points"]) for entry in entries] == [
+        ("p2", 15),
+        ("p1", 10),
+    ]
+
+
+def test_joins_only_touch_a_stale_room(store):
+    store.createRoom("ROOM03", "Busy", OWNER)
+    recent = current() - 10
+    setActiveAt(store, "ROOM03", recent)
+    assert store.addMember("ROOM03", player(1))
+    assert activeAt(store, "ROOM03") == recent
+
+    stale = current() - TOUCH_AFTER_SECONDS - 10
+    setActiveAt(store, "ROOM03", stale)
+    assert store.addMember("ROOM03", player(2), uniqueEmail=False)
+    assert activeAt(store, "ROOM03") >= current() - 1
+
+
+def roomWithPlayers(store, roomCode, count):
+    store.createRoom(roomCode, "Room", OWNER)
+    store.addMember(roomCode, {"id": "owner", **OWNER})
+    for number in range(1, count + 1):
+        store.addMember(roomCode, player(number))
+
+
+def test_recording_an_answer_twice_counts_once(store):
+    roomWithPlayers(store, "ROOM04", 1)
+
+    assert store.recordAnswer("ROOM04", "p1", 1, {"points": 10}) is None
+    assert store.recordAnswer("ROOM04", "p1", 1, {"points": 10}) == (
+        {"error": "Question already answered"},
+        403,
+    )
+    assert store.recordAnswer("ROOM04", "p1", 2, {"points": 5}) is None
+    assert store.recordAnswer("ROOM04", "p9", 1, {"points": 10}) == (
+        {"error": "User not found"},
+        404,
+    )
+    assert store.recordAnswer("NOROOM", "p1", 1, {"points": 10}) == (
+        {"error": "Room not found"},
+        404,
+    )
+    assert store.rank("ROOM04", OWNER["name"], "p1")["points"] == 15
+
+
+def test_leaderboard_ties_keep_join_order(store):
+    roomWithPlayers(store, "ROOM05", 4)
+    for userID, points in (("p1", 10), ("p2", 20), ("p3", 10), ("p4", 5)):
+        store.recordAnswer("ROOM05", userID, 1, {"points": points})
+
+    total, entries = store.leaderboard("ROOM05", OWNER["name"])
+    assert total == 4
+    assert [entry["id"] for entry in entries] == ["p2", "p1", "p3", "p4"]
+    _, page = store.leaderboard("ROOM05", OWNER["name"], limit=2, offset=1)
+    assert [entry["id"] for entry in page] == ["p1", "p3"]
+    ranks = {
+        userID: store.rank("ROOM05", OWNER["name"], userID)["rank"]
+        for userID in ("p1", "p2", "p3", "p4")
+    }
+    assert ranks == {"p2": 1, "p1": 2, "p3": 3, "p4": 4}
+    # The owner hosts, it isn't ranked
+    assert store.rank("ROOM05", OWNER["name"], "owner") is None
+
+
+def test_deleting_a_question_closes_the_gap(store):
+    store.createRoom("ROOM06", "Room", OWNER)
+    assert store.addQuestions("ROOM06", [question(number) for number in (1, 2, 3)])
+
+    assert store.deleteQuestion("ROOM06", "q2")
+    assert not store.deleteQuestion("ROOM06", "q2")
+    assert [q["id"] for q in store.questions("ROOM06")] == ["q1", "q3"]
+    assert store.questionAt("ROOM06", 2)["id"] == "q3"
+    assert store.questionAt("ROOM06", 3) is None
+    assert store.questionCount("ROOM06") == 2
+
+    assert store.addQuestions("ROOM06", [question(4)])
+    assert store.questionAt("ROOM06", 3)["id"] == "q4"
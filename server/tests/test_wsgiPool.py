@@ -0,0 +1,63 @@
+import asyncio
+from time import perf_counter, sleep
+from flask import Flask
+from utils.wsgiPool import PooledWsgiToAsgi
+
+
+def slowApp():
+    app = Flask(__name__)
+
+    @app.route("/slow")
+    def slow():
+        sleep(0.3)
+        return "done"
+
+    return app
+
+
+async def call(app, path):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "query_string": b"",
+        "headers": [],
+        "http_version": "1.1",
+    }
+    await app(scope, receive, send)
+    body = b"".join(message.get("body", b"") for message in messages[1:])
+    return messages[0]["status"], body
+
+
+def test_slow_requests_run_side_by_side():
+    app = PooledWsgiToAsgi(slowApp(), threads=8)
+
+    async def burst():
+        return await asyncio.gather(*(call(app, "/slow") for _ in range(6)))
+
+    start = perf_counter()
+    results = asyncio.run(burst())
+    elapsed = perf_counter() - start
+
+    assert results == [(200, b"done")] * 6
+    # One shared thread would take 6 x 0.3s
+    assert elapsed < 0.9
+
+
+def test_pool_size_bounds_concurrency():
+    app = PooledWsgiToAsgi(slowApp(), threads=2)
+
+    async def burst():
+        return await asyncio.gather(*(call(app, "/slow") for _ in range(4)))
+
+    start = perf_counter()
+    asyncio.run(burst())
+    assert perf_counter() - start >= 0.55
@@ -0,0 +1,115 @@
+import json
+import logging
+import zlib
+from datetime import datetime, timezone
+from threading import Event, Thread
+from time import time
+
+logger = logging.getLogger(__name__)
+
+
+def archiveDocument(roomStore, roomCode):
+    # The final leaderboard as served, plus questions and members with their
+    # answered questions compressed into one blob nobody reads on a hot path
+    room = roomStore.findRoom(roomCode)
+    if not room:
+        return None
+    _, leaderboard = roomStore.leaderboard(roomCode, room["owner"]["name"])
+    history = {
+        "questions": roomStore.questions(roomCode),
+        "members": roomStore.members(roomCode),
+    }
+    return {
+        "code": roomCode,
+        "name": room["name"],
+        "owner": room["owner"],
+        "time": room.get("time"),
+        "archivedAt": datetime.now(timezone.utc),
+        "leaderboard": leaderboard,
+        "history": zlib.compress(json.dumps(history, separators=(",", ":")).encode()),
+    }
+
+
+def archivedLeaderboard(archive, limit=None, offset=0, userID=None):
+    # Same shape as the live and stored leaderboards, entries are already ranked
+    entries = archive["leaderboard"]
+    page = entries[offset:] if limit is None else entries[offset : offset + limit]
+    user = None
+    if userID is not None:
+        for rank, entry in enumerate(entries, 1):
+            if entry["id"] == userID:
+                user = {"rank": rank, **entry}
+                break
+    return len(entries), page, user
+
+
+class RoomArchiver:
+    # Keeps the hot collections to rooms that may still be played. Ended games
+    # older than archiveAfter and played rooms idle for idleAfter move to the
+    # archive, idle rooms without questions that never ran a game are deleted
+    def __init__(
+        self,
+        roomStore,
+        interval=300,
+        archiveAfter=3600,
+        idleAfter=7 * 24 * 3600,
+        archiveTTL=None,
+        batchSize=100,
+        isLive=None,
+        onRemoved=None,
+    ):
+        self.roomStore = roomStore
+        self.interval = interval
+        self.archiveAfter = archiveAfter
+        self.idleAfter = idleAfter
+        self.archiveTTL = archiveTTL
+        self.batchSize = batchSize
+        self.isLive = isLive or (lambda roomCode: False)
+        self.onRemoved = onRemoved or (lambda roomCode: None)
+        self.stopped = Event()
+
+    def start(self):
+        if not self.interval:
+            return
+        Thread(target=self.run, name="roomArchiver", daemon=True).start()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Archiving rooms failed: {e}")
+
+    def sweep(self, now=None):
+        now = time() if now is None else now
+        archived = deleted = 0
+        while True:
+            rooms = self.roomStore.expiredRooms(
+                now - self.archiveAfter, now - self.idleAfter, self.batchSize
+            )
+            removed = 0
+            for roomCode, played in rooms:
+                # A game still running in this process is never idle
+                if self.isLive(roomCode):
+                    continue
+                if played:
+                    document = archiveDocument(self.roomStore, roomCode)
+                    if document is None:
+                        continue
+                    self.roomStore.saveArchive(document)
+                    archived += 1
+                else:
+                    deleted += 1
+                self.roomStore.deleteRoom(roomCode)
+                self.onRemoved(roomCode)
+                removed += 1
+            if len(rooms) < self.batchSize or not removed:
+                break
+        if self.archiveTTL:
+            self.roomStore.expireArchives(now - self.archiveTTL)
+        if archived or deleted:
+            logger.info(f"Archived {archived} rooms, deleted {deleted} idle rooms")
+        return archived, deleted
+
+    def stop(self):
+        self.stopped.set()
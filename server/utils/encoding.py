@@ -0,0 +1,66 @@
+import gzip
+from base64 import b64encode
+from decimal import Decimal
+import brotli
+import orjson
+from bson import ObjectId
+from flask.json.provider import JSONProvider
+from config import Config
+
+
+def default(value):
+    # Types orjson doesn't serialize itself
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (bytes, bytearray)):
+        return b64encode(value).decode("ascii")
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(payload):
+    return orjson.dumps(payload, default=default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class OrjsonProvider(JSONProvider):
+    # jsonify and request.json through orjson
+    def dumps(self, obj, **kwargs):
+        return dumps(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        payload = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(payload), mimetype="application/json")
+
+
+def negotiate(acceptEncoding, size):
+    # Encoding for a body of size bytes, None to send it as is. Brotli is
+    # preferred over gzip, q=0 rules an encoding out
+    if not Config.Compression.ENABLED or size < Config.Compression.MIN_BYTES:
+        return None
+    if not acceptEncoding:
+        return None
+    offered = {}
+    for part in acceptEncoding.split(","):
+        name, _, parameters = part.partition(";")
+        quality = 1.0
+        parameters = parameters.strip()
+        if parameters.startswith("q="):
+            try:
+                quality = float(parameters[2:])
+            except ValueError:
+                quality = 0.0
+        offered[name.strip().lower()] = quality
+    for encoding in ("br", "gzip"):
+        if offered.get(encoding, offered.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=Config.Compression.BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=Config.Compression.GZIP_LEVEL, mtime=0)
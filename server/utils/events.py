@@ -0,0 +1,147 @@
+import asyncio
+import json
+from queue import Empty, Full, Queue
+from threading import Lock, Thread
+
+
+def formatEvent(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class AsyncSubscriber:
+    # Hands events published from request threads over to an event loop
+    def __init__(self, loop, queueSize):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=queueSize)
+
+    def put_nowait(self, item):
+        try:
+            self.loop.call_soon_threadsafe(self.deliver, item)
+        except RuntimeError:
+            # The loop is already closed, the subscriber is gone
+            pass
+
+    def deliver(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            pass
+
+
+class RoomEvents:
+    def __init__(self, queueSize=256, heartbeat=15, localPublish=True):
+        self.lock = Lock()
+        self.subscribers = {}
+        self.queueSize = queueSize
+        self.heartbeat = heartbeat
+        # Disabled when an external source (e.g. a change stream) drives publish
+        self.localPublish = localPublish
+
+    def subscribe(self, roomCode):
+        queue = Queue(maxsize=self.queueSize)
+        with self.lock:
+            self.subscribers.setdefault(roomCode, set()).add(queue)
+        return queue
+
+    def subscribeAsync(self, roomCode):
+        subscriber = AsyncSubscriber(asyncio.get_running_loop(), self.queueSize)
+        with self.lock:
+            self.subscribers.setdefault(roomCode, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, roomCode, queue):
+        with self.lock:
+            queues = self.subscribers.get(roomCode)
+            if queues is None:
+                return
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[roomCode]
+
+    def publish(self, roomCode, event, data):
+        with self.lock:
+            queues = list(self.subscribers.get(roomCode, ()))
+        for queue in queues:
+            try:
+                queue.put_nowait((event, data))
+            except Full:
+                # Slow consumer, drop the event instead of blocking the writer
+                pass
+
+    def emit(self, roomCode, event, data):
+        if self.localPublish:
+            self.publish(roomCode, event, data)
+
+    def subscriberCount(self, roomCode=None):
+        with self.lock:
+            if roomCode is not None:
+                return len(self.subscribers.get(roomCode, ()))
+            return sum(len(queues) for queues in self.subscribers.values())
+
+    def stream(self, roomCode):
+        queue = self.subscribe(roomCode)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event, data = queue.get(timeout=self.heartbeat)
+                except Empty:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield formatEvent(event, data)
+        finally:
+            self.unsubscribe(roomCode, queue)
+
+    async def streamAsync(self, roomCode):
+        subscriber = self.subscribeAsync(roomCode)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(
+                        subscriber.queue.get(), timeout=self.heartbeat
+                    )
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield formatEvent(event, data)
+        finally:
+            self.unsubscribe(roomCode, subscriber)
+
+
+def changeToEvents(change):
+    # Translate a rooms or memberships change stream document into room events
+    document = change.get("fullDocument") or {}
+    collection = change.get("ns", {}).get("coll")
+    operation = change.get("operationType")
+
+    if collection == "memberships":
+        # Deletes carry no roomCode without pre-images, routes emit those locally
+        roomCode = document.get("roomCode")
+        if not roomCode or operation not in ("insert", "update"):
+            return []
+        if operation == "insert":
+            return [(roomCode, "members", {"action": "join", "name": document["name"]})]
+        return [(roomCode, "members", {"action": "update"})]
+
+    roomCode = document.get("code")
+    if not roomCode or operation != "update":
+        return []
+    updatedFields = change.get("updateDescription", {}).get("updatedFields", {})
+    if "gameStarted" in updatedFields:
+        return [(roomCode, "gameStatus", {"gameStarted": updatedFields["gameStarted"]})]
+    return []
+
+
+def watchRooms(database, roomEvents):
+    pipeline = [{"$match": {"ns.coll": {"$in": ["rooms", "memberships"]}}}]
+
+    def run():
+        with database.watch(pipeline, full_document="updateLookup") as changes:
+            for change in changes:
+                for roomCode, event, data in changeToEvents(change):
+                    roomEvents.publish(roomCode, event, data)
+
+    thread = Thread(target=run, name="roomsChangeStream", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,332 @@
+import asyncio
+import logging
+from threading import Condition, Event, Lock, Thread
+from time import sleep
+from utils.leaderboard import ScoreIndex, leaderboardEntry
+
+logger = logging.getLogger(__name__)
+
+
+def resolveWaiter(future):
+    # Runs on the waiter's loop, the wait may have timed out meanwhile
+    if not future.done():
+        future.set_result(None)
+
+
+class LiveMember:
+    __slots__ = (
+        "id",
+        "name",
+        "email",
+        "points",
+        "trueAnswers",
+        "falseAnswers",
+        "answered",
+    )
+
+    def __init__(self, member):
+        self.id = member.get("id")
+        self.name = member["name"]
+        self.email = member.get("email")
+        self.points = member.get("points", 0)
+        self.trueAnswers = member.get("trueAnswers", 0)
+        self.falseAnswers = member.get("falseAnswers", 0)
+        self.answered = set(member.get("answeredQuestions", []))
+
+    def toDict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "email": self.email,
+            "points": self.points,
+            "trueAnswers": self.trueAnswers,
+            "falseAnswers": self.falseAnswers,
+            "answeredQuestions": sorted(self.answered),
+        }
+
+
+class LiveRoom:
+    def __init__(self, room):
+        self.code = room["code"]
+        self.name = room["name"]
+        self.owner = room["owner"]
+        self.questions = room["questions"]
+        self.schedule = room.get("schedule")
+        self.members = {}
+        # Guests share an email, so each email maps to a set of member ids
+        self.byEmail = {}
+        self.scores = ScoreIndex()
+        # Members without an id (the owner) can't answer, keep them for lists
+        self.others = []
+        for member in room["members"]:
+            if member.get("id") is None:
+                self.others.append(member)
+            else:
+                self.addMember(member)
+        self.dirty = set()
+        self.ended = False
+        self.lock = Lock()
+        # Flushes of a room run one at a time so its writes land in order
+        self.flushLock = Lock()
+        # Flush generations for ack after flush: queued is the one the next
+        # flush writes, written the last one stored
+        self.queued = 1
+        self.written = 0
+        self.writes = Condition(self.lock)
+        # (generation, loop, future) for coroutines waiting on a write
+        self.waiters = []
+
+    def addMember(self, member):
+        liveMember = LiveMember(member)
+        self.members[liveMember.id] = liveMember
+        self.byEmail.setdefault(liveMember.email, set()).add(liveMember.id)
+        if liveMember.name != self.owner["name"]:
+            self.scores.add(liveMember.id, liveMember.points)
+
+    def removeMember(self, memberID):
+        member = self.members.pop(memberID, None)
+        if member is not None:
+            self.byEmail.get(member.email, set()).discard(memberID)
+        self.scores.remove(memberID)
+        self.dirty.discard(memberID)
+
+
+class GameStateEngine:
+    # Answers are applied to the live room and written back in one bulk write
+    # per room. durability "enqueue" acknowledges them right away and writes
+    # every flushInterval, "flush" holds the acknowledgement until the write,
+    # answers arriving within commitDelay seconds share it
+    def __init__(
+        self,
+        roomStore,
+        flushInterval=2,
+        durability="enqueue",
+        commitDelay=0.005,
+        commitTimeout=5,
+        retryInterval=5,
+    ):
+        if durability not in ("enqueue", "flush"):
+            raise ValueError(f"Unknown answer durability {durability}")
+        self.roomStore = roomStore
+        self.flushInterval = flushInterval
+        self.durable = durability == "flush"
+        self.commitDelay = commitDelay
+        self.commitTimeout = commitTimeout
+        self.retryInterval = retryInterval
+        self.rooms = {}
+        self.lock = Lock()
+        self.stopped = Event()
+        self.wake = Event()
+        self.flusher = None
+
+    def start(self, roomCode, room=None):
+        # A game already live is kept as is, replacing it would drop the
+        # answers not yet written and strand the requests waiting on them
+        liveRoom = self.get(roomCode)
+        if liveRoom is not None:
+            return liveRoom
+        if room is None:
+            room = self.roomStore.loadRoom(roomCode)
+        if not room:
+            return None
+        with self.lock:
+            liveRoom = self.rooms.setdefault(roomCode, LiveRoom(room))
+            self.ensureFlusher()
+        return liveRoom
+
+    def get(self, roomCode):
+        return self.rooms.get(roomCode)
+
+    def end(self, roomCode):
+        # Drain: stop taking answers, then write every member back before the
+        # game is marked as ended. The room stays registered until the write
+        # succeeds, so answers arriving meanwhile get a 409 instead of going
+        # to the store and being overwritten by this flush
+        liveRoom = self.get(roomCode)
+        if liveRoom is None:
+            return None
+        with liveRoom.lock:
+            liveRoom.ended = True
+        try:
+            with liveRoom.flushLock:
+                self.flushRoom(roomCode, liveRoom, full=True)
+        except Exception:
+            # A failed write leaves it live for the flusher to retry, which
+            # runs for ended games even without periodic flushes
+            with self.lock:
+                self.ensureFlusher(retrying=True)
+            self.wake.set()
+            raise
+        self.forget(roomCode, liveRoom)
+        return liveRoom
+
+    def forget(self, roomCode, liveRoom):
+        with self.lock:
+            if self.rooms.get(roomCode) is liveRoom:
+                del self.rooms[roomCode]
+
+    def discard(self, roomCode):
+        with self.lock:
+            return self.rooms.pop(roomCode, None)
+
+    def activeRooms(self):
+        return len(self.rooms)
+
+    def activePlayers(self):
+        return sum(len(room.members) for room in list(self.rooms.values()))
+
+    def addMember(self, roomCode, member):
+        liveRoom = self.get(roomCode)
+        if liveRoom is None or member.get("id") is None:
+            return
+        with liveRoom.lock:
+            if member["id"] not in liveRoom.members:
+                liveRoom.addMember(member)
+
+    def removeMember(self, roomCode, userID=None, email=None):
+        liveRoom = self.get(roomCode)
+        if liveRoom is None:
+            return
+        with liveRoom.lock:
+            memberIDs = set(liveRoom.byEmail.get(email, ())) if email else set()
+            if userID is not None:
+                memberIDs.add(userID)
+            for memberID in memberIDs:
+                liveRoom.removeMember(memberID)
+
+    def answer(self, liveRoom, userID, questionNumber, increments):
+        with liveRoom.lock:
+            if liveRoom.ended:
+                return ({"error": "Game has ended"}, 409)
+            member = liveRoom.members.get(userID)
+            if member is None:
+                return ({"error": "User not found"}, 404)
+            if questionNumber in member.answered:
+                return ({"error": "Question already answered"}, 403)
+            member.answered.add(questionNumber)
+            for field, value in increments.items():
+                setattr(member, field, getattr(member, field) + value)
+            if increments.get("points") and userID in liveRoom.scores:
+                liveRoom.scores.update(userID, member.points)
+            liveRoom.dirty.add(userID)
+        return None
+
+    def commit(self, liveRoom):
+        # Returns once every answer recorded in the room so far is written
+        with liveRoom.lock:
+            generation = liveRoom.queued
+            self.wake.set()
+            if not liveRoom.writes.wait_for(
+                lambda: liveRoom.written >= generation, self.commitTimeout
+            ):
+                raise TimeoutError("Answer recorded but not written yet")
+
+    async def commitAsync(self, liveRoom):
+        # commit for coroutines, the flusher resolves the future on this loop
+        future = asyncio.get_running_loop().create_future()
+        with liveRoom.lock:
+            liveRoom.waiters.append((liveRoom.queued, future.get_loop(), future))
+            self.wake.set()
+        try:
+            await asyncio.wait_for(future, self.commitTimeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError("Answer recorded but not written yet")
+
+    def leaderboard(self, liveRoom, limit=None, offset=0):
+        with liveRoom.lock:
+            return len(liveRoom.scores), [
+                leaderboardEntry(liveRoom.members[memberID].toDict())
+                for memberID in liveRoom.scores.top(limit, offset)
+            ]
+
+    def rank(self, liveRoom, userID):
+        with liveRoom.lock:
+            rank = liveRoom.scores.rank(userID)
+            if rank is None:
+                return None
+            return {"rank": rank, **leaderboardEntry(liveRoom.members[userID].toDict())}
+
+    def flush(self, roomCode=None, full=False):
+        if roomCode is None:
+            roomCodes = list(self.rooms)
+        else:
+            roomCodes = [roomCode]
+
+        for code in roomCodes:
+            liveRoom = self.get(code)
+            if liveRoom is None:
+                continue
+            with liveRoom.flushLock:
+                self.flushRoom(code, liveRoom, full)
+            if liveRoom.ended:
+                # An ended game whose final write failed, now stored
+                self.forget(code, liveRoom)
+
+    def flushRoom(self, code, liveRoom, full):
+        with liveRoom.lock:
+            if full:
+                liveRoom.dirty.update(liveRoom.members)
+            dirty = [
+                liveRoom.members[userID].toDict()
+                for userID in liveRoom.dirty
+                if userID in liveRoom.members
+            ]
+            liveRoom.dirty.clear()
+            generation = liveRoom.queued
+            liveRoom.queued += 1
+
+        if dirty:
+            try:
+                self.roomStore.writeScores(code, dirty)
+            except Exception:
+                # Keep the members dirty so the next flush retries them, the
+                # answers waiting on this generation are released by that one
+                with liveRoom.lock:
+                    liveRoom.dirty.update(member["id"] for member in dirty)
+                raise
+
+        with liveRoom.lock:
+            liveRoom.written = generation
+            liveRoom.writes.notify_all()
+            waiting = []
+            for waiter in liveRoom.waiters:
+                if waiter[0] > generation:
+                    waiting.append(waiter)
+                elif not waiter[2].done():
+                    waiter[1].call_soon_threadsafe(resolveWaiter, waiter[2])
+            liveRoom.waiters = waiting
+
+    def ensureFlusher(self, retrying=False):
+        if self.flusher is not None:
+            return
+        if not (self.flushInterval or self.durable or retrying):
+            return
+        self.flusher = Thread(target=self.runFlusher, name="gameFlusher", daemon=True)
+        self.flusher.start()
+
+    def runFlusher(self):
+        while True:
+            woken = self.wake.wait(self.flushInterval or self.retryDelay())
+            if self.stopped.is_set():
+                return
+            if woken:
+                # Answers waiting on a write woke us, give the ones arriving
+                # right behind them commitDelay to join the same bulk write
+                self.wake.clear()
+                sleep(self.commitDelay)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Flushing live scores failed: {e}")
+
+    def retryDelay(self):
+        # Without periodic flushes the flusher only wakes on its own while an
+        # ended game still has scores to write
+        if any(liveRoom.ended for liveRoom in list(self.rooms.values())):
+            return self.retryInterval
+        return None
+
+    def stop(self):
+        self.stopped.set()
+        self.wake.set()
+        self.flush()
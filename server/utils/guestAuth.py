@@ -0,0 +1,35 @@
+import jwt
+from config import Config
+from utils.roomStore import GUEST_EMAIL
+
+
+def guestClaims(authorization):
+    # Claims of the guest token from /joinGuest in an Authorization header, None
+    # without a valid one
+    if not authorization or not authorization.startswith("Bearer "):
+        return None
+    try:
+        claims = jwt.decode(
+            authorization[len("Bearer ") :], Config.SECRET_KEY, algorithms=["HS256"]
+        )
+    except jwt.InvalidTokenError:
+        return None
+    return claims if claims.get("guest") else None
+
+
+def liveGuest(liveRoom, userID):
+    # Whether userID is a guest of the live game, None when the room isn't live
+    # here and the store has to be asked
+    if liveRoom is None:
+        return None
+    member = liveRoom.members.get(userID)
+    return member is not None and member.email == GUEST_EMAIL
+
+
+def guestError(claims, roomCode, userID):
+    # Guests act only with their own token, for their own id in its room
+    if claims is None:
+        return ({"error": "Guest token required"}, 401)
+    if claims.get("sub") != userID or claims.get("roomCode") != roomCode:
+        return ({"error": "Access denied"}, 403)
+    return None
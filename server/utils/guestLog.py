@@ -0,0 +1,61 @@
+import logging
+from threading import Event, Lock, Thread
+from utils.timestamp import current
+
+logger = logging.getLogger(__name__)
+
+
+class GuestLog:
+    # Guest records are only kept for bookkeeping, a join never waits on them.
+    # They are written in batches every flushInterval, or sooner once maxBatch
+    # guests are waiting
+    def __init__(self, roomStore, flushInterval=5, maxBatch=500):
+        self.roomStore = roomStore
+        self.flushInterval = flushInterval
+        self.maxBatch = maxBatch
+        self.pending = []
+        self.lock = Lock()
+        self.wake = Event()
+        self.stopped = False
+        self.flusher = None
+
+    def record(self, guestID, name):
+        with self.lock:
+            self.pending.append({"id": guestID, "name": name, "time": current()})
+            full = len(self.pending) >= self.maxBatch
+            self.ensureFlusher()
+        if full or not self.flushInterval:
+            self.wake.set()
+
+    def ensureFlusher(self):
+        if self.flusher is not None:
+            return
+        self.flusher = Thread(target=self.runFlusher, name="guestFlusher", daemon=True)
+        self.flusher.start()
+
+    def runFlusher(self):
+        while not self.stopped:
+            self.wake.wait(self.flushInterval or None)
+            self.wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Writing guest records failed: {e}")
+
+    def flush(self):
+        with self.lock:
+            batch, self.pending = self.pending, []
+        for start in range(0, len(batch), self.maxBatch):
+            try:
+                self.roomStore.addGuests(batch[start : start + self.maxBatch])
+            except Exception:
+                # Back in line for the next flush, addGuests skips the guests a
+                # failed batch did write
+                with self.lock:
+                    self.pending[:0] = batch[start:]
+                raise
+
+    def stop(self):
+        self.stopped = True
+        self.wake.set()
+        self.flush()
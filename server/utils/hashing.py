@@ -1,11 +1,46 @@
 import bcrypt
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore
+from config import Config
+
+
+class HashingBusy(Exception):
+    pass
+
+
+# bcrypt releases the GIL, so a thread pool keeps it off the request threads
+executor = ThreadPoolExecutor(
+    max_workers=Config.Hashing.WORKERS, thread_name_prefix="hashing"
+)
+slots = BoundedSemaphore(Config.Hashing.WORKERS + Config.Hashing.QUEUE_SIZE)
+
+
+def runInPool(function, *args):
+    if not slots.acquire(blocking=False):
+        raise HashingBusy("Too many password operations in progress, try again")
+    try:
+        future = executor.submit(function, *args)
+    except Exception:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    return future.result()
+
+
+def hashRounds(hashedPassword: bytes) -> int:
+    # Hashes look like $2b$12$<salt+hash>
+    return int(hashedPassword.split(b"$")[2])
+
+
+def needsRehash(hashedPassword: bytes) -> bool:
+    return hashRounds(hashedPassword) != Config.Hashing.ROUNDS
 
 
 def hashPassword(plainPassword: str) -> bytes:
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(plainPassword.encode("utf-8"), salt)
+    salt = bcrypt.gensalt(rounds=Config.Hashing.ROUNDS)
+    hashed = runInPool(bcrypt.hashpw, plainPassword.encode("utf-8"), salt)
     return hashed
 
 
 def verifyPassword(plainPassword: str, hashedPassword: bytes) -> bool:
-    return bcrypt.checkpw(plainPassword.encode("utf-8"), hashedPassword)
+    return runInPool(bcrypt.checkpw, plainPassword.encode("utf-8"), hashedPassword)
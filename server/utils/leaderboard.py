@@ -0,0 +1,60 @@
+from bisect import bisect_left, insort
+from itertools import count
+
+
+class ScoreIndex:
+    # Members ordered by points, ties keep join order like the old stable sort
+    def __init__(self):
+        self.entries = []
+        self.keys = {}
+        self.order = count()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, memberID):
+        return memberID in self.keys
+
+    def add(self, memberID, points=0):
+        if memberID in self.keys:
+            return self.update(memberID, points)
+        key = (-points, next(self.order), memberID)
+        self.keys[memberID] = key
+        insort(self.entries, key)
+
+    def update(self, memberID, points):
+        oldKey = self.keys.get(memberID)
+        if oldKey is None:
+            return self.add(memberID, points)
+        if -oldKey[0] == points:
+            return
+        del self.entries[bisect_left(self.entries, oldKey)]
+        key = (-points, oldKey[1], memberID)
+        self.keys[memberID] = key
+        insort(self.entries, key)
+
+    def remove(self, memberID):
+        key = self.keys.pop(memberID, None)
+        if key is not None:
+            del self.entries[bisect_left(self.entries, key)]
+
+    def top(self, limit=None, offset=0):
+        end = None if limit is None else offset + limit
+        return [key[2] for key in self.entries[offset:end]]
+
+    def rank(self, memberID):
+        key = self.keys.get(memberID)
+        if key is None:
+            return None
+        return bisect_left(self.entries, key) + 1
+
+
+def leaderboardEntry(member):
+    # answeredQuestions is not needed to render a leaderboard
+    return {
+        "id": member.get("id"),
+        "name": member["name"],
+        "points": member.get("points", 0),
+        "trueAnswers": member.get("trueAnswers", 0),
+        "falseAnswers": member.get("falseAnswers", 0),
+    }
@@ -0,0 +1,211 @@
+from itertools import count
+from threading import Lock
+import bson
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+
+def formatLabels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+        self.lock = Lock()
+
+    def inc(self, *labelValues, amount=1):
+        with self.lock:
+            self.values[labelValues] = self.values.get(labelValues, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            values = list(self.values.items())
+        for labelValues, value in values:
+            lines.append(f"{self.name}{formatLabels(self.labels, labelValues)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}
+        self.lock = Lock()
+
+    def observe(self, value, *labelValues):
+        with self.lock:
+            series = self.series.get(labelValues)
+            if series is None:
+                # One counter per bucket plus +Inf, then sum
+                series = self.series[labelValues] = [0] * (len(self.buckets) + 1) + [0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            allSeries = [(key, list(series)) for key, series in self.series.items()]
+        names = self.labels + ("le",)
+        for labelValues, series in allSeries:
+            cumulative = 0
+            for bound, hits in zip(self.buckets + ("+Inf",), series):
+                cumulative += hits
+                labels = formatLabels(names, labelValues + (bound,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = formatLabels(self.labels, labelValues)
+            lines.append(f"{self.name}_sum{labels} {series[-1]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Gauge:
+    # Value is read from a callback at scrape time, so the hot path pays nothing
+    def __init__(self, name, help, function, labels=()):
+        self.name = name
+        self.help = help
+        self.function = function
+        self.labels = labels
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        value = self.function()
+        if isinstance(value, dict):
+            for labelValues, item in value.items():
+                lines.append(
+                    f"{self.name}{formatLabels(self.labels, labelValues)} {item}"
+                )
+        else:
+            lines.append(f"{self.name} {value}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception:
+                # A failing gauge callback must not break the scrape
+                continue
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+requestLatency = registry.register(
+    Histogram(
+        "quizapp_request_duration_seconds",
+        "Request latency by route",
+        labels=("route", "method", "status"),
+    )
+)
+mongoLatency = registry.register(
+    Histogram(
+        "quizapp_mongo_command_duration_seconds",
+        "MongoDB command latency by collection",
+        labels=("collection", "command"),
+    )
+)
+mongoFailures = registry.register(
+    Counter(
+        "quizapp_mongo_command_failures_total",
+        "Failed MongoDB commands",
+        labels=("collection", "command"),
+    )
+)
+mongoBytes = registry.register(
+    Counter(
+        "quizapp_mongo_document_bytes_total",
+        "Estimated BSON bytes sent to and read from MongoDB, sampled",
+        labels=("collection", "direction"),
+    )
+)
+
+responseCacheResults = registry.register(
+    Counter(
+        "quizapp_response_cache_total",
+        "Cached read responses by route and result",
+        labels=("route", "result"),
+    )
+)
+
+
+class MongoMetrics(monitoring.CommandListener):
+    def __init__(self, bytesSampleEvery=16):
+        self.pending = {}
+        # Encoding documents to size them is costly, measure every Nth command
+        self.bytesSampleEvery = bytesSampleEvery
+        self.sequence = count()
+
+    def sampled(self):
+        if not self.bytesSampleEvery:
+            return False
+        return next(self.sequence) % self.bytesSampleEvery == 0
+
+    def started(self, event):
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        else:
+            collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = "none"
+        sample = self.sampled()
+        self.pending[event.request_id] = (collection, sample)
+        if sample and event.command_name in ("insert", "update", "delete"):
+            mongoBytes.inc(
+                collection,
+                "written",
+                amount=len(bson.encode(event.command)) * self.bytesSampleEvery,
+            )
+
+    def succeeded(self, event):
+        collection, sample = self.pending.pop(event.request_id, ("none", False))
+        mongoLatency.observe(
+            event.duration_micros / 1e6, collection, event.command_name
+        )
+        if sample and event.command_name in ("find", "aggregate", "getMore"):
+            mongoBytes.inc(
+                collection,
+                "read",
+                amount=len(bson.encode(event.reply)) * self.bytesSampleEvery,
+            )
+
+    def failed(self, event):
+        collection, _ = self.pending.pop(event.request_id, ("none", False))
+        mongoLatency.observe(
+            event.duration_micros / 1e6, collection, event.command_name
+        )
+        mongoFailures.inc(collection, event.command_name)
+
+
+rateLimited = registry.register(
+    Counter(
+        "quizapp_rate_limited_total",
+        "Requests refused by the per client rate limit",
+        labels=("route",),
+    )
+)
@@ -0,0 +1,26 @@
+# Fields each read path needs, so polls only pull what they render
+GAME_STATUS = {"_id": 0, "gameStarted": 1}
+QUESTION_COUNT = {"_id": 0, "questionCount": 1}
+
+# questions and memberships documents, without the keys used to look them up
+QUESTION = {"_id": 0, "roomCode": 0, "position": 0}
+MEMBER = {"_id": 0, "roomCode": 0, "joined": 0}
+MEMBER_NAME = {"_id": 0, "name": 1}
+# joined breaks ties between equal scores, drop it before responding
+LEADERBOARD_ENTRY = {
+    "_id": 0,
+    "id": 1,
+    "name": 1,
+    "points": 1,
+    "trueAnswers": 1,
+    "falseAnswers": 1,
+    "joined": 1,
+}
+
+
+def roomFields(fields):
+    # code keeps the result truthy, schemaVersion tells the store whether the
+    # room still needs migrating
+    projection = {"_id": 0, "code": 1, "schemaVersion": 1}
+    projection.update({field: 1 for field in fields})
+    return projection
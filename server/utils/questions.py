@@ -0,0 +1,141 @@
+import csv
+import io
+import json
+from utils.codeGenerator import generateCode
+
+ANSWER_KEYS = ("a", "b", "c", "d")
+CSV_FIELDS = ("question", "a", "b", "c", "d", "correct", "point", "time")
+
+
+def positiveInt(value, field):
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} must be a number")
+    if number <= 0:
+        raise ValueError(f"{field} must be greater than 0")
+    return number
+
+
+def buildQuestion(data):
+    # Same shape /addQuestion has always stored, raises ValueError when invalid
+    if not isinstance(data, dict):
+        raise ValueError("question must be an object")
+    question = data.get("question")
+    if not isinstance(question, str) or not question.strip():
+        raise ValueError("question is required")
+
+    answers = data.get("answers")
+    if not isinstance(answers, dict):
+        raise ValueError("answers must have a, b, c and d")
+    for key in ANSWER_KEYS:
+        if not isinstance(answers.get(key), str) or not answers[key].strip():
+            raise ValueError(f"answer {key} is required")
+
+    if data.get("correct") not in ANSWER_KEYS:
+        raise ValueError("correct must be one of a, b, c, d")
+
+    return {
+        "id": generateCode(length=64),
+        "question": question,
+        "answers": {key: answers[key] for key in ANSWER_KEYS},
+        "correct": data["correct"],
+        "point": positiveInt(data.get("point"), "point"),
+        "time": positiveInt(data.get("time"), "time"),
+    }
+
+
+def revealTimes(questions, schedule):
+    # Question n shows once every earlier question's time and a gap have passed
+    revealAt = schedule["startedAt"]
+    for question in questions:
+        yield revealAt
+        revealAt += question["time"] + schedule["gap"]
+
+
+def playerQuestion(question):
+    # Players get everything needed to render the question but its answer
+    return {key: value for key, value in question.items() if key != "correct"}
+
+
+def questionWindow(questions, first, size, schedule=None, start=1):
+    # questions begins at number start, and at 1 when there is a schedule
+    if schedule:
+        reveals = list(revealTimes(questions[: first - start + size], schedule))
+    window = []
+    for index in range(first - start, min(first - start + size, len(questions))):
+        entry = playerQuestion(questions[index])
+        entry["number"] = start + index
+        entry["revealAt"] = reveals[index] if schedule else None
+        window.append(entry)
+    return window
+
+
+def readJSONLines(stream):
+    for lineNumber, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield lineNumber, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield lineNumber, ValueError(f"invalid JSON: {e.msg}")
+
+
+def readCSV(stream):
+    # Header row names the columns, see CSV_FIELDS
+    reader = csv.DictReader(stream)
+    for row in reader:
+        yield reader.line_num, {
+            "question": row.get("question"),
+            "answers": {key: row.get(key) for key in ANSWER_KEYS},
+            "correct": (row.get("correct") or "").strip().lower(),
+            "point": row.get("point"),
+            "time": row.get("time"),
+        }
+
+
+def parseQuestions(binaryStream, fileFormat, maxQuestions, maxErrors=20):
+    stream = io.TextIOWrapper(binaryStream, encoding="utf-8-sig", newline="")
+    rows = readCSV(stream) if fileFormat == "csv" else readJSONLines(stream)
+    questions = []
+    errors = []
+    for lineNumber, row in rows:
+        try:
+            if isinstance(row, ValueError):
+                raise row
+            questions.append(buildQuestion(row))
+        except ValueError as e:
+            errors.append({"line": lineNumber, "error": str(e)})
+            if len(errors) >= maxErrors:
+                break
+        if len(questions) > maxQuestions:
+            errors.append(
+                {"line": lineNumber, "error": f"more than {maxQuestions} questions"}
+            )
+            break
+    return questions, errors
+
+
+def exportJSONLines(questions):
+    for question in questions:
+        yield json.dumps(
+            {field: question[field] for field in question if field != "id"}
+        ) + "\n"
+
+
+def exportCSV(questions):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_FIELDS)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    for question in questions:
+        writer.writerow(
+            [question["question"]]
+            + [question["answers"][key] for key in ANSWER_KEYS]
+            + [question["correct"], question["point"], question["time"]]
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
@@ -0,0 +1,65 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+
+LOOPBACK = ("127.0.0.1", "::1")
+MAX_TAB_ID = 64
+
+
+def clientAddress(remoteAddress, forwardedFor=None):
+    # Behind cluster.py every request comes from the router on loopback, it
+    # passes the real address on in X-Forwarded-For
+    if forwardedFor and remoteAddress in LOOPBACK:
+        return forwardedFor.split(",")[-1].strip()
+    return remoteAddress
+
+
+def tabID(value):
+    # The per tab id the client sends in X-Client-ID, ignored when malformed
+    if value and len(value) <= MAX_TAB_ID and value.isprintable():
+        return value
+    return None
+
+
+class RateLimiter:
+    # Token bucket per client and route, budgets maps a route to
+    # (requests per second, burst). A client sending a tab id gets a bucket of
+    # its own, and every tab at its address shares one tabsPerAddress times as
+    # large, so a classroom behind one NAT isn't limited like a single tab.
+    # Least recently seen clients are dropped
+    def __init__(self, budgets, maxClients=65536, tabsPerAddress=64):
+        self.budgets = budgets
+        self.maxClients = maxClients
+        self.tabsPerAddress = tabsPerAddress
+        # (client, tab, route) and (client, route) -> (tokens, updatedAt)
+        self.buckets = OrderedDict()
+        self.lock = Lock()
+
+    def check(self, client, route, tab=None):
+        # Seconds to wait before trying again, 0 when the request may go ahead
+        budget = self.budgets.get(route)
+        if budget is None:
+            return 0
+        rate, burst = budget
+        # Clients without a tab id share the tab None bucket of their address
+        share = self.tabsPerAddress
+        limits = [
+            ((client, tab, route), rate, burst),
+            ((client, route), rate * share, burst * share),
+        ]
+        now = monotonic()
+        with self.lock:
+            buckets = []
+            wait = 0
+            for key, refill, size in limits:
+                tokens, updatedAt = self.buckets.pop(key, (size, now))
+                tokens = min(size, tokens + (now - updatedAt) * refill)
+                if tokens < 1:
+                    wait = max(wait, (1 - tokens) / refill)
+                buckets.append((key, tokens))
+            # A request is only charged to its buckets when all of them allow it
+            for key, tokens in buckets:
+                self.buckets[key] = (tokens - 1 if not wait else tokens, now)
+            while len(self.buckets) > self.maxClients:
+                self.buckets.popitem(last=False)
+        return wait
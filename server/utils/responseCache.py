@@ -0,0 +1,61 @@
+from collections import OrderedDict
+from hashlib import blake2b
+from secrets import token_hex
+from threading import Lock
+
+
+class ResponseCache:
+    # Room versions only live in this process, every mutation here bumps them
+    def __init__(self, maxEntries=4096):
+        self.maxEntries = maxEntries
+        self.versions = {}
+        self.entries = OrderedDict()
+        self.lock = Lock()
+        # Versions restart at 0, so tags from a previous process must not match
+        self.epoch = token_hex(4)
+
+    def version(self, roomCode, questionsOnly=False):
+        # Answers and joins leave the questions version alone
+        versions = self.versions.get(roomCode, (0, 0))
+        return versions[1] if questionsOnly else versions[0]
+
+    def bump(self, roomCode, questions=False):
+        # Call after the write, a read racing it then caches under the old version
+        with self.lock:
+            version, questionsVersion = self.versions.get(roomCode, (0, 0))
+            self.versions[roomCode] = (
+                version + 1,
+                questionsVersion + 1 if questions else questionsVersion,
+            )
+
+    def key(self, route, roomCode, variant=(), questionsOnly=False):
+        version = self.version(roomCode, questionsOnly)
+        key = (route, roomCode, version, variant)
+        digest = blake2b(repr(key).encode("utf-8"), digest_size=8).hexdigest()
+        return key, f"{self.epoch}-{digest}"
+
+    def get(self, key):
+        with self.lock:
+            body = self.entries.get(key)
+            if body is not None:
+                self.entries.move_to_end(key)
+            return body
+
+    def put(self, key, body):
+        with self.lock:
+            self.entries[key] = body
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxEntries:
+                self.entries.popitem(last=False)
+
+    def encoded(self, key, encoding, body, encode):
+        # Compressed copies of a cached body share its LRU, they go stale with it
+        encodedKey = (*key, encoding)
+        encodedBody = self.get(encodedKey)
+        if encodedBody is None:
+            encodedBody = encode(body, encoding)
+            self.put(encodedKey, encodedBody)
+        return encodedBody
+
+    def __len__(self):
+        return len(self.entries)
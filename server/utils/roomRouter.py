@@ -0,0 +1,211 @@
+import asyncio
+import json
+import logging
+import re
+import zlib
+from itertools import count
+from urllib.parse import parse_qs
+import h11
+
+logger = logging.getLogger(__name__)
+
+# Headers that only describe one connection, never passed through
+HOP_HEADERS = {
+    b"connection",
+    b"keep-alive",
+    b"proxy-authenticate",
+    b"proxy-authorization",
+    b"te",
+    b"trailer",
+    b"transfer-encoding",
+    b"upgrade",
+}
+FORM_ROOM_CODE = re.compile(rb'name="roomCode"\r\n\r\n([^\r\n]*)')
+
+
+def roomCodeOf(scope, body):
+    # Room routes name the room in the path, the query string or the body
+    path = scope["path"]
+    if path.startswith("/events/"):
+        return path[len("/events/") :]
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    if "roomCode" in query:
+        return query["roomCode"][0]
+    if body.startswith(b"{"):
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return None
+        roomCode = data.get("roomCode") if isinstance(data, dict) else None
+        return roomCode if isinstance(roomCode, str) else None
+    match = FORM_ROOM_CODE.search(body)
+    return match.group(1).decode("utf-8", "replace") if match else None
+
+
+class WorkerConnection:
+    def __init__(self, port, reader, writer):
+        self.port = port
+        self.reader = reader
+        self.writer = writer
+        self.http = h11.Connection(h11.CLIENT)
+        self.reused = False
+        # Set once the response started, a failed request can't be retried then
+        self.responded = False
+
+    def close(self):
+        self.writer.close()
+
+
+class RoomRouter:
+    # ASGI app sending every request for a room to the same worker process, so
+    # its live game, response cache and event subscribers stay together.
+    # Requests without a room are spread round robin
+    def __init__(self, ports, host="127.0.0.1"):
+        self.ports = ports
+        self.host = host
+        self.idle = {port: [] for port in ports}
+        self.roundRobin = count()
+
+    def workerFor(self, roomCode):
+        if roomCode is None:
+            return self.ports[next(self.roundRobin) % len(self.ports)]
+        return self.ports[zlib.crc32(roomCode.encode("utf-8")) % len(self.ports)]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        port = self.workerFor(roomCodeOf(scope, body))
+
+        # Event streams only end when the client leaves, stop forwarding then
+        forwarding = asyncio.ensure_future(self.forward(scope, body, send, port))
+        disconnected = asyncio.ensure_future(self.waitForDisconnect(receive))
+        await asyncio.wait(
+            {forwarding, disconnected}, return_when=asyncio.FIRST_COMPLETED
+        )
+        disconnected.cancel()
+        if not forwarding.done():
+            forwarding.cancel()
+            return
+        forwarding.result()
+
+    async def waitForDisconnect(self, receive):
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    async def forward(self, scope, body, send, port):
+        # A pooled connection may have been closed by the worker while idle, the
+        # request never reached it then and is retried once on a new connection
+        for attempt in range(2):
+            connection = await self.connect(port, fresh=attempt > 0)
+            if connection is None:
+                break
+            try:
+                await self.exchange(connection, scope, body, send)
+                return
+            except (ConnectionError, h11.RemoteProtocolError) as e:
+                connection.close()
+                if connection.responded:
+                    return
+                logger.warning(f"Worker on port {port} dropped a request: {e}")
+                if not connection.reused:
+                    break
+            except BaseException:
+                connection.close()
+                raise
+        body = json.dumps({"error": "Worker unavailable"}).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 502,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    async def connect(self, port, fresh=False):
+        idle = self.idle[port]
+        if idle and not fresh:
+            connection = idle.pop()
+            connection.reused = True
+            return connection
+        try:
+            reader, writer = await asyncio.open_connection(self.host, port)
+        except OSError as e:
+            logger.error(f"Worker on port {port} is not reachable: {e}")
+            return None
+        return WorkerConnection(port, reader, writer)
+
+    async def exchange(self, connection, scope, body, send):
+        http = connection.http
+        connection.responded = False
+        target = scope.get("raw_path") or scope["path"].encode("utf-8")
+        if scope.get("query_string"):
+            target += b"?" + scope["query_string"]
+        headers = []
+        forwardedFor = []
+        for name, value in scope["headers"]:
+            name = name.lower()
+            if name == b"x-forwarded-for":
+                forwardedFor.append(value)
+            elif name not in HOP_HEADERS and name != b"content-length":
+                headers.append((name, value))
+        headers.append((b"content-length", str(len(body)).encode()))
+        if scope.get("client"):
+            # The last address is the one the router saw, clients can't forge it
+            forwardedFor.append(scope["client"][0].encode())
+        if forwardedFor:
+            headers.append((b"x-forwarded-for", b", ".join(forwardedFor)))
+        connection.writer.write(
+            http.send(
+                h11.Request(method=scope["method"], target=target, headers=headers)
+            )
+        )
+        if body:
+            connection.writer.write(http.send(h11.Data(data=body)))
+        connection.writer.write(http.send(h11.EndOfMessage()))
+        await connection.writer.drain()
+
+        while True:
+            event = http.next_event()
+            if event is h11.NEED_DATA:
+                http.receive_data(await connection.reader.read(65536))
+            elif isinstance(event, h11.Response):
+                await send(
+                    {
+                        "type": "http.response.start",
+                        "status": event.status_code,
+                        "headers": [
+                            (name, value)
+                            for name, value in event.headers
+                            if name not in HOP_HEADERS
+                        ],
+                    }
+                )
+                connection.responded = True
+            elif isinstance(event, h11.Data):
+                await send(
+                    {
+                        "type": "http.response.body",
+                        "body": bytes(event.data),
+                        "more_body": True,
+                    }
+                )
+            elif isinstance(event, h11.EndOfMessage):
+                await send({"type": "http.response.body", "body": b""})
+                break
+            elif isinstance(event, h11.ConnectionClosed):
+                raise ConnectionError("connection closed before the response")
+        if http.our_state is h11.DONE and http.their_state is h11.DONE:
+            http.start_next_cycle()
+            self.idle[connection.port].append(connection)
+        else:
+            connection.close()
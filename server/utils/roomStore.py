@@ -0,0 +1,667 @@
+import asyncio
+from time import time
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from utils import projections
+from utils.leaderboard import leaderboardEntry
+from utils.questions import questionWindow
+from utils.scoring import answerError, answerUpdate
+from utils.timestamp import current
+
+GUEST_EMAIL = "guest@app.com"
+# Joins only move activeAt once it is this old, the idle sweep works in days
+# and a write per join on the room document would serialize busy rooms
+TOUCH_AFTER_SECONDS = 3600
+
+# Rooms without schemaVersion still embed questions and members arrays, at
+# version 2 memberships still list answeredQuestions instead of the answered set
+SCHEMA_VERSION = 3
+ROOM_FIELDS = (
+    "name",
+    "owner",
+    "code",
+    "gameStarted",
+    "bannedUsers",
+    "time",
+    "schedule",
+)
+
+
+def leaderboardQuery(roomCode, ownerName):
+    return {"roomCode": roomCode, "name": {"$ne": ownerName}}
+
+
+def rankQuery(roomCode, ownerName, member):
+    # Members ahead of this one: more points, or same points and joined earlier
+    query = leaderboardQuery(roomCode, ownerName)
+    query["$or"] = [
+        {"points": {"$gt": member.get("points", 0)}},
+        {"points": member.get("points", 0), "joined": {"$lt": member["joined"]}},
+    ]
+    return query
+
+
+def newMember(roomCode, member):
+    return {"roomCode": roomCode, "joined": time(), **member}
+
+
+def answeredSet(questionNumbers):
+    # Stored as {"3": true, ...} so checking one question is a field lookup
+    return {str(number): True for number in questionNumbers}
+
+
+def memberView(member):
+    # Readers and live games get the sorted answeredQuestions list
+    if "answered" in member:
+        member["answeredQuestions"] = sorted(map(int, member.pop("answered")))
+    return member
+
+
+def ignoreDuplicates(error):
+    # Re-running a migration upserts the same documents, only duplicates are fine
+    if any(item.get("code") != 11000 for item in error.details["writeErrors"]):
+        raise error
+
+
+class RoomStore:
+    # Every read and write the routes make against MongoDB, sqliteStore.py has
+    # the same methods for the embedded backend
+    def __init__(self, getDatabase):
+        self.getDatabase = getDatabase
+
+    def collection(self, name):
+        return self.getDatabase()[name]
+
+    # Users, guests and revoked tokens
+
+    def userExists(self, email):
+        return (
+            self.collection("users").find_one({"email": email}, {"_id": 1}) is not None
+        )
+
+    def addUser(self, name, email, password):
+        # Raises DuplicateKeyError when the email is already registered
+        self.collection("users").insert_one(
+            {"name": name, "password": password, "email": email, "time": current()}
+        )
+
+    def findUser(self, email):
+        user = self.collection("users").find_one({"email": email})
+        if user:
+            user["id"] = str(user.pop("_id"))
+        return user
+
+    def setPassword(self, email, password):
+        self.collection("users").update_one(
+            {"email": email}, {"$set": {"password": password}}
+        )
+
+    def addGuests(self, guests):
+        # Guest ids are minted by the server, a retried batch skips the ones
+        # that already made it
+        try:
+            self.collection("guests").insert_many(
+                [
+                    {
+                        "_id": ObjectId(guest["id"]),
+                        "name": guest["name"],
+                        "email": GUEST_EMAIL,
+                        "time": guest["time"],
+                    }
+                    for guest in guests
+                ],
+                ordered=False,
+            )
+        except BulkWriteError as e:
+            if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                raise
+
+    def revokeToken(self, jti, revokedAt, expiresAt=None):
+        # Raises DuplicateKeyError when the token was already revoked
+        document = {"jti": jti, "revokedAt": revokedAt}
+        if expiresAt is not None:
+            document["expiresAt"] = expiresAt
+        self.collection("revokedTokens").insert_one(document)
+
+    def isTokenRevoked(self, jti):
+        return (
+            self.collection("revokedTokens").find_one({"jti": jti}, {"_id": 1})
+            is not None
+        )
+
+    # Rooms
+
+    def createRoom(self, roomCode, name, owner):
+        self.collection("rooms").insert_one(
+            {
+                "name": name,
+                "time": current(),
+                "owner": owner,
+                "code": roomCode,
+                "gameStarted": False,
+                "questionCount": 0,
+                "schemaVersion": SCHEMA_VERSION,
+                "activeAt": current(),
+            }
+        )
+        self.collection("memberships").insert_one(newMember(roomCode, owner))
+
+    def findRoom(self, roomCode, fields=ROOM_FIELDS):
+        rooms = self.collection("rooms")
+        room = rooms.find_one({"code": roomCode}, projections.roomFields(fields))
+        if room and room.get("schemaVersion") != SCHEMA_VERSION:
+            self.migrateRoom(rooms.find_one({"code": roomCode}))
+            room = rooms.find_one({"code": roomCode}, projections.roomFields(fields))
+        return room
+
+    def setGameStarted(self, roomCode, started, schedule=None):
+        # schedule holds startedAt and gap for paced games
+        update = {"gameStarted": started, "schedule": schedule, "activeAt": current()}
+        if started:
+            result = self.collection("rooms").update_one(
+                {"code": roomCode}, {"$set": update, "$unset": {"endedAt": ""}}
+            )
+        else:
+            update["endedAt"] = update["activeAt"]
+            result = self.collection("rooms").update_one(
+                {"code": roomCode}, {"$set": update}
+            )
+        return result.matched_count > 0
+
+    def touchRoom(self, roomCode):
+        # A room being joined isn't idle, see expiredRooms. Rooms touched
+        # recently don't match, so most joins leave the room document alone
+        now = current()
+        self.collection("rooms").update_one(
+            {
+                "code": roomCode,
+                "$or": [
+                    {"activeAt": {"$lt": now - TOUCH_AFTER_SECONDS}},
+                    {"activeAt": {"$exists": False}},
+                ],
+            },
+            {"$set": {"activeAt": now}},
+        )
+
+    def deleteRoom(self, roomCode):
+        self.collection("questions").delete_many({"roomCode": roomCode})
+        self.collection("memberships").delete_many({"roomCode": roomCode})
+        return self.collection("rooms").delete_one({"code": roomCode}).deleted_count
+
+    def banMember(self, roomCode, userID):
+        self.collection("memberships").delete_many({"roomCode": roomCode, "id": userID})
+        self.collection("rooms").update_one(
+            {"code": roomCode}, {"$addToSet": {"bannedUsers": userID}}
+        )
+
+    # Questions
+
+    def questions(self, roomCode):
+        return list(
+            self.collection("questions")
+            .find({"roomCode": roomCode}, projections.QUESTION)
+            .sort("position", 1)
+        )
+
+    def questionAt(self, roomCode, questionNumber):
+        return self.collection("questions").find_one(
+            {"roomCode": roomCode, "position": questionNumber}, projections.QUESTION
+        )
+
+    def answerKey(self, roomCode, questionNumber):
+        # Scoring skips findRoom, a legacy room only migrates when this misses
+        question = self.questionAt(roomCode, questionNumber)
+        if question is None and self.findRoom(roomCode, ()):
+            question = self.questionAt(roomCode, questionNumber)
+        return question
+
+    def questionCount(self, roomCode):
+        room = self.findRoom(roomCode, ("questionCount",))
+        return room["questionCount"] if room else None
+
+    def questionWindow(self, roomCode, first, size):
+        room = self.findRoom(roomCode, ("questionCount", "schedule"))
+        if not room:
+            return None
+        # Reveal times add up every earlier question, so paced games read from 1
+        start = 1 if room.get("schedule") else first
+        questions = list(
+            self.collection("questions")
+            .find(
+                {
+                    "roomCode": roomCode,
+                    "position": {"$gte": start, "$lt": first + size},
+                },
+                projections.QUESTION,
+            )
+            .sort("position", 1)
+        )
+        window = questionWindow(questions, first, size, room.get("schedule"), start)
+        return room["questionCount"], window
+
+    def addQuestions(self, roomCode, questions):
+        if not self.findRoom(roomCode, ()):
+            return False
+        # Reserve positions atomically so concurrent appends don't collide
+        room = self.collection("rooms").find_one_and_update(
+            {"code": roomCode},
+            {
+                "$inc": {"questionCount": len(questions)},
+                "$set": {"activeAt": current()},
+            },
+            projection={"questionCount": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        first = room["questionCount"] - len(questions) + 1
+        self.collection("questions").insert_many(
+            [
+                {"roomCode": roomCode, "position": first + index, **question}
+                for index, question in enumerate(questions)
+            ]
+        )
+        return True
+
+    def deleteQuestion(self, roomCode, questionID):
+        question = self.collection("questions").find_one_and_delete(
+            {"roomCode": roomCode, "id": questionID}, projection={"position": 1}
+        )
+        if not question:
+            return False
+        # Keep positions contiguous so questionAt stays an index lookup
+        self.collection("questions").update_many(
+            {"roomCode": roomCode, "position": {"$gt": question["position"]}},
+            {"$inc": {"position": -1}},
+        )
+        self.collection("rooms").update_one(
+            {"code": roomCode},
+            {"$inc": {"questionCount": -1}, "$set": {"activeAt": current()}},
+        )
+        return True
+
+    # Members
+
+    def members(self, roomCode, projection=projections.MEMBER):
+        cursor = self.collection("memberships").find({"roomCode": roomCode}, projection)
+        return [memberView(member) for member in cursor.sort("joined", 1)]
+
+    def memberNames(self, roomCode):
+        return [
+            member["name"] for member in self.members(roomCode, projections.MEMBER_NAME)
+        ]
+
+    def isMember(self, roomCode, email):
+        return (
+            self.collection("memberships").find_one(
+                {"roomCode": roomCode, "email": email}, {"_id": 1}
+            )
+            is not None
+        )
+
+    def addMember(self, roomCode, member, uniqueEmail=True):
+        # Registered users join once per email, guests always get a new membership
+        memberships = self.collection("memberships")
+        if not uniqueEmail:
+            memberships.insert_one(newMember(roomCode, member))
+            self.touchRoom(roomCode)
+            return True
+        try:
+            result = memberships.update_one(
+                {"roomCode": roomCode, "email": member["email"]},
+                {"$setOnInsert": newMember(roomCode, member)},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # The same user joining twice at once, the other request inserted it
+            return False
+        if result.upserted_id is None:
+            return False
+        self.touchRoom(roomCode)
+        return True
+
+    def removeMembers(self, roomCode, email):
+        self.collection("memberships").delete_many(
+            {"roomCode": roomCode, "email": email}
+        )
+
+    def removeMember(self, roomCode, userID):
+        self.collection("memberships").delete_many({"roomCode": roomCode, "id": userID})
+
+    def isGuest(self, roomCode, userID):
+        return (
+            self.collection("memberships").find_one(
+                {"roomCode": roomCode, "id": userID, "email": GUEST_EMAIL}, {"_id": 1}
+            )
+            is not None
+        )
+
+    def recordAnswer(self, roomCode, userID, questionNumber, increments):
+        memberships = self.collection("memberships")
+        query, update = answerUpdate(roomCode, userID, questionNumber, increments)
+        if memberships.update_one(query, update).matched_count:
+            return None
+
+        if not self.findRoom(roomCode, ()):
+            return answerError(None, None)
+        # findRoom may just have migrated a legacy room, try once more
+        if memberships.update_one(query, update).matched_count:
+            return None
+        member = memberships.find_one({"roomCode": roomCode, "id": userID}, {"_id": 1})
+        return answerError(True, member)
+
+    def writeScores(self, roomCode, members):
+        self.collection("memberships").bulk_write(
+            [
+                UpdateOne(
+                    {"roomCode": roomCode, "id": member["id"]},
+                    {
+                        "$set": {
+                            "points": member["points"],
+                            "trueAnswers": member["trueAnswers"],
+                            "falseAnswers": member["falseAnswers"],
+                            "answered": answeredSet(member["answeredQuestions"]),
+                        }
+                    },
+                )
+                for member in members
+            ],
+            ordered=False,
+        )
+
+    def leaderboard(self, roomCode, ownerName, limit=None, offset=0):
+        memberships = self.collection("memberships")
+        query = leaderboardQuery(roomCode, ownerName)
+        cursor = (
+            memberships.find(query, projections.LEADERBOARD_ENTRY)
+            .sort([("points", -1), ("joined", 1)])
+            .skip(offset)
+        )
+        if limit is not None:
+            cursor = cursor.limit(limit)
+        entries = [leaderboardEntry(member) for member in cursor]
+        return memberships.count_documents(query), entries
+
+    def rank(self, roomCode, ownerName, userID):
+        memberships = self.collection("memberships")
+        member = memberships.find_one(
+            {"roomCode": roomCode, "id": userID}, projections.LEADERBOARD_ENTRY
+        )
+        if not member or member["name"] == ownerName:
+            return None
+        ahead = memberships.count_documents(rankQuery(roomCode, ownerName, member))
+        return {"rank": ahead + 1, **leaderboardEntry(member)}
+
+    def loadRoom(self, roomCode):
+        # Whole room in the legacy shape, used to start a live game
+        room = self.findRoom(roomCode)
+        if not room:
+            return None
+        room["questions"] = self.questions(roomCode)
+        room["members"] = self.members(roomCode)
+        return room
+
+    # Archive
+
+    def expiredRooms(self, endedBefore, idleBefore, limit):
+        # (code, played) for rooms the archiver should move or drop. Rooms with
+        # questions, and rooms from before activity was tracked, count as
+        # played so their questions and scores are kept
+        cursor = (
+            self.collection("rooms")
+            .find(
+                {
+                    "$or": [
+                        {"endedAt": {"$lt": endedBefore}},
+                        {"activeAt": {"$lt": idleBefore}},
+                        {"activeAt": {"$exists": False}, "time": {"$lt": idleBefore}},
+                    ]
+                },
+                {
+                    "_id": 0,
+                    "code": 1,
+                    "gameStarted": 1,
+                    "activeAt": 1,
+                    "endedAt": 1,
+                    "questionCount": 1,
+                },
+            )
+            .limit(limit)
+        )
+        return [
+            (
+                room["code"],
+                "endedAt" in room
+                or bool(room.get("gameStarted"))
+                or bool(room.get("questionCount"))
+                or "activeAt" not in room,
+            )
+            for room in cursor
+        ]
+
+    def saveArchive(self, document):
+        # Replaces an archive another process wrote for the same room
+        self.collection("archivedRooms").replace_one(
+            {"code": document["code"]}, document, upsert=True
+        )
+
+    def archivedRoom(self, roomCode):
+        return self.collection("archivedRooms").find_one(
+            {"code": roomCode}, {"_id": 0, "history": 0}
+        )
+
+    def expireArchives(self, before):
+        # The TTL index on archivedAt drops them
+        pass
+
+    # Migration
+
+    def migrateRoom(self, room):
+        # Idempotent, concurrent requests may migrate the same room
+        roomCode = room["code"]
+        questions = room.get("questions") or []
+        members = room.get("members") or []
+        joined = room.get("time", 0)
+
+        try:
+            if questions:
+                self.collection("questions").bulk_write(
+                    [
+                        UpdateOne(
+                            {"roomCode": roomCode, "id": question.get("id")},
+                            {
+                                "$setOnInsert": {
+                                    "roomCode": roomCode,
+                                    "position": position,
+                                    **question,
+                                }
+                            },
+                            upsert=True,
+                        )
+                        for position, question in enumerate(questions, start=1)
+                    ],
+                    ordered=False,
+                )
+            if members:
+                self.collection("memberships").bulk_write(
+                    [
+                        UpdateOne(
+                            {
+                                "roomCode": roomCode,
+                                "id": member.get("id"),
+                                "email": member.get("email"),
+                            },
+                            {
+                                "$setOnInsert": {
+                                    "roomCode": roomCode,
+                                    # Keep the array order for member lists and ties
+                                    "joined": joined + index / 1e6,
+                                    **member,
+                                }
+                            },
+                            upsert=True,
+                        )
+                        for index, member in enumerate(members)
+                    ],
+                    ordered=False,
+                )
+        except BulkWriteError as e:
+            ignoreDuplicates(e)
+        self.migrateAnswered(roomCode)
+
+        self.collection("rooms").update_one(
+            {"code": roomCode, "schemaVersion": {"$ne": SCHEMA_VERSION}},
+            {
+                "$set": {
+                    "schemaVersion": SCHEMA_VERSION,
+                    # Counted, version 2 rooms keep no questions array to measure
+                    "questionCount": self.collection("questions").count_documents(
+                        {"roomCode": roomCode}
+                    ),
+                },
+                "$unset": {"questions": "", "members": ""},
+            },
+        )
+
+    def migrateAnswered(self, roomCode):
+        # answeredQuestions arrays become answered sets, merged with any answers
+        # recorded since
+        memberships = self.collection("memberships")
+        legacy = memberships.find(
+            {"roomCode": roomCode, "answeredQuestions": {"$exists": True}},
+            {"_id": 1, "answeredQuestions": 1},
+        )
+        updates = []
+        for member in legacy:
+            update = {"$unset": {"answeredQuestions": ""}}
+            if member["answeredQuestions"]:
+                update["$set"] = {
+                    f"answered.{number}": True for number in member["answeredQuestions"]
+                }
+            updates.append(UpdateOne({"_id": member["_id"]}, update))
+        if updates:
+            memberships.bulk_write(updates, ordered=False)
+
+    def migrateAll(self):
+        migrated = 0
+        legacyRooms = self.collection("rooms").find(
+            {"schemaVersion": {"$ne": SCHEMA_VERSION}}
+        )
+        for room in legacyRooms:
+            self.migrateRoom(room)
+            migrated += 1
+        return migrated
+
+
+class AsyncRoomStore:
+    # Read and scoring paths used by asgi.py, legacy rooms migrate on a thread
+    def __init__(self, getDatabase, roomStore):
+        self.getDatabase = getDatabase
+        self.roomStore = roomStore
+
+    def collection(self, name):
+        return self.getDatabase()[name]
+
+    async def findRoom(self, roomCode, fields=ROOM_FIELDS):
+        room = await self.collection("rooms").find_one(
+            {"code": roomCode}, projections.roomFields(fields)
+        )
+        if room and room.get("schemaVersion") != SCHEMA_VERSION:
+            room = await asyncio.to_thread(self.roomStore.findRoom, roomCode, fields)
+        return room
+
+    async def archivedRoom(self, roomCode):
+        return await self.collection("archivedRooms").find_one(
+            {"code": roomCode}, {"_id": 0, "history": 0}
+        )
+
+    async def questions(self, roomCode):
+        cursor = self.collection("questions").find(
+            {"roomCode": roomCode}, projections.QUESTION
+        )
+        return await cursor.sort("position", 1).to_list(None)
+
+    async def questionAt(self, roomCode, questionNumber):
+        return await self.collection("questions").find_one(
+            {"roomCode": roomCode, "position": questionNumber}, projections.QUESTION
+        )
+
+    async def answerKey(self, roomCode, questionNumber):
+        question = await self.questionAt(roomCode, questionNumber)
+        if question is None and await self.findRoom(roomCode, ()):
+            question = await self.questionAt(roomCode, questionNumber)
+        return question
+
+    async def questionCount(self, roomCode):
+        room = await self.findRoom(roomCode, ("questionCount",))
+        return room["questionCount"] if room else None
+
+    async def questionWindow(self, roomCode, first, size):
+        room = await self.findRoom(roomCode, ("questionCount", "schedule"))
+        if not room:
+            return None
+        start = 1 if room.get("schedule") else first
+        cursor = self.collection("questions").find(
+            {"roomCode": roomCode, "position": {"$gte": start, "$lt": first + size}},
+            projections.QUESTION,
+        )
+        questions = await cursor.sort("position", 1).to_list(None)
+        window = questionWindow(questions, first, size, room.get("schedule"), start)
+        return room["questionCount"], window
+
+    async def members(self, roomCode, projection=projections.MEMBER):
+        cursor = self.collection("memberships").find({"roomCode": roomCode}, projection)
+        members = await cursor.sort("joined", 1).to_list(None)
+        return [memberView(member) for member in members]
+
+    async def memberNames(self, roomCode):
+        members = await self.members(roomCode, projections.MEMBER_NAME)
+        return [member["name"] for member in members]
+
+    async def isGuest(self, roomCode, userID):
+        return (
+            await self.collection("memberships").find_one(
+                {"roomCode": roomCode, "id": userID, "email": GUEST_EMAIL}, {"_id": 1}
+            )
+            is not None
+        )
+
+    async def recordAnswer(self, roomCode, userID, questionNumber, increments):
+        memberships = self.collection("memberships")
+        query, update = answerUpdate(roomCode, userID, questionNumber, increments)
+        if (await memberships.update_one(query, update)).matched_count:
+            return None
+
+        if not await self.findRoom(roomCode, ()):
+            return answerError(None, None)
+        if (await memberships.update_one(query, update)).matched_count:
+            return None
+        member = await memberships.find_one(
+            {"roomCode": roomCode, "id": userID}, {"_id": 1}
+        )
+        return answerError(True, member)
+
+    async def leaderboard(self, roomCode, ownerName, limit=None, offset=0):
+        memberships = self.collection("memberships")
+        query = leaderboardQuery(roomCode, ownerName)
+        cursor = (
+            memberships.find(query, projections.LEADERBOARD_ENTRY)
+            .sort([("points", -1), ("joined", 1)])
+            .skip(offset)
+        )
+        if limit is not None:
+            cursor = cursor.limit(limit)
+        total = await memberships.count_documents(query)
+        entries = [leaderboardEntry(member) for member in await cursor.to_list(None)]
+        return total, entries
+
+    async def rank(self, roomCode, ownerName, userID):
+        memberships = self.collection("memberships")
+        member = await memberships.find_one(
+            {"roomCode": roomCode, "id": userID}, projections.LEADERBOARD_ENTRY
+        )
+        if not member or member["name"] == ownerName:
+            return None
+        ahead = await memberships.count_documents(
+            rankQuery(roomCode, ownerName, member)
+        )
+        return {"rank": ahead + 1, **leaderboardEntry(member)}
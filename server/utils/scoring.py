@@ -0,0 +1,51 @@
+def calculatePoint(basePoint, timeTaken):
+    return int((basePoint * (basePoint / (timeTaken / 96))) / 128)
+
+
+def answerIncrements(question, answer, elapsed, minSeconds=1):
+    # Scored from the stored question and the time the server measured
+    if answer != question["correct"]:
+        return {"falseAnswers": 1}
+    # Unknown or late answers count as taking the whole question time
+    timeTaken = question["time"] if elapsed is None else elapsed
+    timeTaken = min(max(timeTaken, minSeconds), question["time"])
+    return {
+        "points": calculatePoint(question["point"], timeTaken),
+        "trueAnswers": 1,
+    }
+
+
+def scoreDelta(userID, increments):
+    # Payload of the leaderboard event sent after an answer is scored
+    return {
+        "id": userID,
+        "points": increments.get("points", 0),
+        "trueAnswers": increments.get("trueAnswers", 0),
+        "falseAnswers": increments.get("falseAnswers", 0),
+    }
+
+
+def answerUpdate(roomCode, userID, questionNumber, increments):
+    # Single membership update, the filter guards against answering twice.
+    # answered is keyed by question number, so the check is one field lookup
+    field = f"answered.{questionNumber}"
+    query = {
+        "roomCode": roomCode,
+        "id": userID,
+        field: {"$exists": False},
+        # Members not migrated yet still keep an answeredQuestions array
+        "answeredQuestions": {"$ne": questionNumber},
+    }
+    update = {"$set": {field: True}}
+    if increments:
+        update["$inc"] = increments
+    return query, update
+
+
+def answerError(room, member):
+    # Why answerUpdate matched nothing
+    if not room:
+        return ({"error": "Room not found"}, 404)
+    if not member:
+        return ({"error": "User not found"}, 404)
+    return ({"error": "Question already answered"}, 403)
@@ -0,0 +1,55 @@
+import asyncio
+from threading import Event, Lock
+
+
+class Call:
+    def __init__(self):
+        self.done = Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    # Concurrent calls with the same key share one run of the function, the
+    # result comes back with whether it was shared
+    def __init__(self):
+        self.calls = {}
+        self.lock = Lock()
+
+    def do(self, key, function):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = function()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result, False
+
+
+class AsyncSingleFlight:
+    def __init__(self):
+        self.calls = {}
+
+    async def do(self, key, function):
+        call = self.calls.get(key)
+        if call is not None:
+            return await asyncio.shield(call), True
+
+        # Shielded, a leader whose client went away still finishes for the rest
+        call = self.calls[key] = asyncio.ensure_future(function())
+        call.add_done_callback(lambda _: self.calls.pop(key, None))
+        return await asyncio.shield(call), False
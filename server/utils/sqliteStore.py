@@ -0,0 +1,597 @@
+import json
+import sqlite3
+from threading import RLock
+from time import time
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from utils import projections
+from utils.leaderboard import leaderboardEntry
+from utils.questions import questionWindow
+from utils.roomStore import (
+    GUEST_EMAIL,
+    ROOM_FIELDS,
+    SCHEMA_VERSION,
+    TOUCH_AFTER_SECONDS,
+)
+from utils.scoring import answerError
+from utils.timestamp import current
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    email TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    password TEXT NOT NULL,
+    time INTEGER
+);
+CREATE TABLE IF NOT EXISTS guests (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    time INTEGER
+);
+CREATE TABLE IF NOT EXISTS revokedTokens (
+    jti TEXT PRIMARY KEY,
+    revokedAt REAL NOT NULL,
+    expiresAt REAL
+);
+CREATE INDEX IF NOT EXISTS revokedTokensExpiresAt ON revokedTokens (expiresAt);
+CREATE TABLE IF NOT EXISTS rooms (
+    code TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    time INTEGER,
+    gameStarted INTEGER NOT NULL DEFAULT 0,
+    bannedUsers TEXT,
+    questionCount INTEGER NOT NULL DEFAULT 0,
+    schedule TEXT,
+    activeAt INTEGER,
+    endedAt INTEGER
+);
+CREATE TABLE IF NOT EXISTS questions (
+    roomCode TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    id TEXT NOT NULL,
+    document TEXT NOT NULL,
+    PRIMARY KEY (roomCode, position),
+    UNIQUE (roomCode, id)
+);
+CREATE TABLE IF NOT EXISTS memberships (
+    roomCode TEXT NOT NULL,
+    id TEXT,
+    name TEXT NOT NULL,
+    email TEXT,
+    points INTEGER,
+    trueAnswers INTEGER,
+    falseAnswers INTEGER,
+    joined REAL NOT NULL,
+    UNIQUE (roomCode, id)
+);
+CREATE INDEX IF NOT EXISTS membershipsEmail ON memberships (roomCode, email);
+CREATE INDEX IF NOT EXISTS membershipsScore
+    ON memberships (roomCode, points DESC, joined);
+CREATE TABLE IF NOT EXISTS answers (
+    roomCode TEXT NOT NULL,
+    memberID TEXT NOT NULL,
+    questionNumber INTEGER NOT NULL,
+    PRIMARY KEY (roomCode, memberID, questionNumber)
+);
+CREATE TABLE IF NOT EXISTS archivedRooms (
+    code TEXT PRIMARY KEY,
+    archivedAt REAL NOT NULL,
+    document TEXT NOT NULL,
+    history BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS archivedRoomsAge ON archivedRooms (archivedAt);
+"""
+# Columns added after the first release, older files get them on open
+ADDED_COLUMNS = {"rooms": ("activeAt INTEGER", "endedAt INTEGER")}
+ADDED_INDEXES = """
+CREATE INDEX IF NOT EXISTS roomsEnded ON rooms (endedAt);
+CREATE INDEX IF NOT EXISTS roomsActive ON rooms (activeAt);
+"""
+MEMBER_COLUMNS = ("id", "name", "email", "points", "trueAnswers", "falseAnswers")
+SCORE_FIELDS = ("points", "trueAnswers", "falseAnswers")
+
+
+def rowDocument(row):
+    # NULL columns are fields the document never had, like the owner's points
+    return {key: row[key] for key in row.keys() if row[key] is not None}
+
+
+def project(document, projection):
+    # The subset of Mongo projections the routes use: all inclusions or all
+    # exclusions, _id aside
+    fields = {key: value for key, value in projection.items() if key != "_id"}
+    if any(fields.values()):
+        return {key: document[key] for key in fields if key in document}
+    return {key: value for key, value in document.items() if key not in fields}
+
+
+class SqliteStore:
+    # Embedded backend with the same methods as RoomStore, for a single node.
+    # One connection shared by every thread, SQLite serializes writers anyway
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self.connection.row_factory = sqlite3.Row
+        self.lock = RLock()
+        with self.lock:
+            # WAL lets the file be read while a write commits, NORMAL only
+            # syncs at checkpoints, a power cut may lose the last commits
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.executescript(SCHEMA)
+            for table, columns in ADDED_COLUMNS.items():
+                existing = {
+                    row["name"]
+                    for row in self.connection.execute(f"PRAGMA table_info({table})")
+                }
+                for column in columns:
+                    if column.split()[0] not in existing:
+                        self.connection.execute(
+                            f"ALTER TABLE {table} ADD COLUMN {column}"
+                        )
+            self.connection.executescript(ADDED_INDEXES)
+
+    def query(self, sql, parameters=()):
+        with self.lock:
+            return self.connection.execute(sql, parameters).fetchall()
+
+    def execute(self, sql, parameters=()):
+        with self.lock:
+            return self.connection.execute(sql, parameters).rowcount
+
+    def transaction(self):
+        return Transaction(self)
+
+    # Users, guests and revoked tokens
+
+    def userExists(self, email):
+        return bool(self.query("SELECT 1 FROM users WHERE email = ?", (email,)))
+
+    def addUser(self, name, email, password):
+        try:
+            self.execute(
+                "INSERT INTO users (id, email, name, password, time) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (str(ObjectId()), email, name, password, current()),
+            )
+        except sqlite3.IntegrityError as e:
+            # Callers handle the same duplicate error for either backend
+            raise DuplicateKeyError(str(e)) from e
+
+    def findUser(self, email):
+        rows = self.query("SELECT * FROM users WHERE email = ?", (email,))
+        return rowDocument(rows[0]) if rows else None
+
+    def setPassword(self, email, password):
+        self.execute("UPDATE users SET password = ? WHERE email = ?", (password, email))
+
+    def addGuests(self, guests):
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO guests (id, name, time) VALUES (?, ?, ?)",
+                [(guest["id"], guest["name"], guest["time"]) for guest in guests],
+            )
+
+    def revokeToken(self, jti, revokedAt, expiresAt=None):
+        with self.transaction():
+            # Nothing sweeps expired tokens in the background, drop them here
+            self.execute("DELETE FROM revokedTokens WHERE expiresAt < ?", (time(),))
+            try:
+                self.execute(
+                    "INSERT INTO revokedTokens (jti, revokedAt, expiresAt) "
+                    "VALUES (?, ?, ?)",
+                    (
+                        jti,
+                        revokedAt.timestamp(),
+                        expiresAt.timestamp() if expiresAt else None,
+                    ),
+                )
+            except sqlite3.IntegrityError as e:
+                raise DuplicateKeyError(str(e)) from e
+
+    def isTokenRevoked(self, jti):
+        return bool(self.query("SELECT 1 FROM revokedTokens WHERE jti = ?", (jti,)))
+
+    # Rooms
+
+    def createRoom(self, roomCode, name, owner):
+        with self.transaction():
+            try:
+                self.execute(
+                    "INSERT INTO rooms (code, name, owner, time, activeAt) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (roomCode, name, json.dumps(owner), current(), current()),
+                )
+            except sqlite3.IntegrityError as e:
+                raise DuplicateKeyError(str(e)) from e
+            self.insertMember(roomCode, owner)
+
+    def findRoom(self, roomCode, fields=ROOM_FIELDS):
+        rows = self.query("SELECT * FROM rooms WHERE code = ?", (roomCode,))
+        if not rows:
+            return None
+        row = rows[0]
+        room = {
+            "code": row["code"],
+            "schemaVersion": SCHEMA_VERSION,
+            "name": row["name"],
+            "owner": json.loads(row["owner"]),
+            "time": row["time"],
+            "gameStarted": bool(row["gameStarted"]),
+            "questionCount": row["questionCount"],
+            "schedule": json.loads(row["schedule"]) if row["schedule"] else None,
+        }
+        if row["bannedUsers"]:
+            room["bannedUsers"] = json.loads(row["bannedUsers"])
+        return {
+            key: value
+            for key, value in room.items()
+            if key in fields or key in ("code", "schemaVersion")
+        }
+
+    def setGameStarted(self, roomCode, started, schedule=None):
+        now = current()
+        return (
+            self.execute(
+                "UPDATE rooms SET gameStarted = ?, schedule = ?, activeAt = ?, "
+                "endedAt = ? WHERE code = ?",
+                (
+                    int(started),
+                    json.dumps(schedule) if schedule else None,
+                    now,
+                    None if started else now,
+                    roomCode,
+                ),
+            )
+            > 0
+        )
+
+    def deleteRoom(self, roomCode):
+        with self.transaction():
+            for table in ("questions", "memberships", "answers"):
+                self.execute(f"DELETE FROM {table} WHERE roomCode = ?", (roomCode,))
+            return self.execute("DELETE FROM rooms WHERE code = ?", (roomCode,))
+
+    def banMember(self, roomCode, userID):
+        with self.transaction():
+            self.deleteMembers(roomCode, "id", userID)
+            room = self.findRoom(roomCode, ("bannedUsers",))
+            if not room:
+                return
+            bannedUsers = room.get("bannedUsers", [])
+            if userID not in bannedUsers:
+                bannedUsers.append(userID)
+            self.execute(
+                "UPDATE rooms SET bannedUsers = ? WHERE code = ?",
+                (json.dumps(bannedUsers), roomCode),
+            )
+
+    # Questions
+
+    def questionRows(self, roomCode, first=1, last=None):
+        sql = "SELECT document FROM questions WHERE roomCode = ? AND position >= ?"
+        parameters = [roomCode, first]
+        if last is not None:
+            sql += " AND position < ?"
+            parameters.append(last)
+        rows = self.query(sql + " ORDER BY position", parameters)
+        return [json.loads(row["document"]) for row in rows]
+
+    def questions(self, roomCode):
+        return self.questionRows(roomCode)
+
+    def questionAt(self, roomCode, questionNumber):
+        questions = self.questionRows(roomCode, questionNumber, questionNumber + 1)
+        return questions[0] if questions else None
+
+    def answerKey(self, roomCode, questionNumber):
+        # No legacy rooms to migrate here
+        return self.questionAt(roomCode, questionNumber)
+
+    def questionCount(self, roomCode):
+        room = self.findRoom(roomCode, ("questionCount",))
+        return room["questionCount"] if room else None
+
+    def questionWindow(self, roomCode, first, size):
+        room = self.findRoom(roomCode, ("questionCount", "schedule"))
+        if not room:
+            return None
+        start = 1 if room.get("schedule") else first
+        questions = self.questionRows(roomCode, start, first + size)
+        window = questionWindow(questions, first, size, room.get("schedule"), start)
+        return room["questionCount"], window
+
+    def addQuestions(self, roomCode, questions):
+        with self.transaction():
+            room = self.findRoom(roomCode, ("questionCount",))
+            if not room:
+                return False
+            self.connection.executemany(
+                "INSERT INTO questions (roomCode, position, id, document) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (roomCode, position, question["id"], json.dumps(question))
+                    for position, question in enumerate(
+                        questions, start=room["questionCount"] + 1
+                    )
+                ],
+            )
+            self.execute(
+                "UPDATE rooms SET questionCount = questionCount + ?, activeAt = ? "
+                "WHERE code = ?",
+                (len(questions), current(), roomCode),
+            )
+        return True
+
+    def deleteQuestion(self, roomCode, questionID):
+        with self.transaction():
+            rows = self.query(
+                "SELECT position FROM questions WHERE roomCode = ? AND id = ?",
+                (roomCode, questionID),
+            )
+            if not rows:
+                return False
+            position = rows[0]["position"]
+            self.execute(
+                "DELETE FROM questions WHERE roomCode = ? AND id = ?",
+                (roomCode, questionID),
+            )
+            # Keep positions contiguous so questionAt stays an index lookup. Via
+            # negative positions, the primary key is checked row by row
+            self.execute(
+                "UPDATE questions SET position = -position "
+                "WHERE roomCode = ? AND position > ?",
+                (roomCode, position),
+            )
+            self.execute(
+                "UPDATE questions SET position = -position - 1 "
+                "WHERE roomCode = ? AND position < 0",
+                (roomCode,),
+            )
+            self.execute(
+                "UPDATE rooms SET questionCount = questionCount - 1, activeAt = ? "
+                "WHERE code = ?",
+                (current(), roomCode),
+            )
+        return True
+
+    # Members
+
+    def insertMember(self, roomCode, member, joined=None):
+        self.execute(
+            "INSERT INTO memberships (roomCode, joined, "
+            + ", ".join(MEMBER_COLUMNS)
+            + ") VALUES (?, ?"
+            + ", ?" * len(MEMBER_COLUMNS)
+            + ")",
+            (roomCode, joined or time(), *(member.get(key) for key in MEMBER_COLUMNS)),
+        )
+        for number in member.get("answeredQuestions", []):
+            self.execute(
+                "INSERT OR IGNORE INTO answers VALUES (?, ?, ?)",
+                (roomCode, member["id"], number),
+            )
+
+    def deleteMembers(self, roomCode, column, value):
+        with self.transaction():
+            self.execute(
+                "DELETE FROM answers WHERE roomCode = ? AND memberID IN "
+                f"(SELECT id FROM memberships WHERE roomCode = ? AND {column} = ?)",
+                (roomCode, roomCode, value),
+            )
+            self.execute(
+                f"DELETE FROM memberships WHERE roomCode = ? AND {column} = ?",
+                (roomCode, value),
+            )
+
+    def members(self, roomCode, projection=projections.MEMBER):
+        rows = self.query(
+            "SELECT m.*, (SELECT group_concat(questionNumber) FROM answers a "
+            "WHERE a.roomCode = m.roomCode AND a.memberID = m.id) AS answered "
+            "FROM memberships m WHERE m.roomCode = ? ORDER BY m.joined",
+            (roomCode,),
+        )
+        members = []
+        for row in rows:
+            member = rowDocument(row)
+            del member["roomCode"]
+            answered = member.pop("answered", None)
+            if answered:
+                member["answeredQuestions"] = sorted(map(int, answered.split(",")))
+            members.append(project(member, projection))
+        return members
+
+    def memberNames(self, roomCode):
+        return [
+            member["name"] for member in self.members(roomCode, projections.MEMBER_NAME)
+        ]
+
+    def isMember(self, roomCode, email):
+        return bool(
+            self.query(
+                "SELECT 1 FROM memberships WHERE roomCode = ? AND email = ?",
+                (roomCode, email),
+            )
+        )
+
+    def addMember(self, roomCode, member, uniqueEmail=True):
+        with self.transaction():
+            if uniqueEmail and self.isMember(roomCode, member["email"]):
+                return False
+            self.insertMember(roomCode, member)
+            # A room being joined isn't idle, see expiredRooms
+            now = current()
+            self.execute(
+                "UPDATE rooms SET activeAt = ? "
+                "WHERE code = ? AND (activeAt IS NULL OR activeAt < ?)",
+                (now, roomCode, now - TOUCH_AFTER_SECONDS),
+            )
+        return True
+
+    def removeMembers(self, roomCode, email):
+        self.deleteMembers(roomCode, "email", email)
+
+    def removeMember(self, roomCode, userID):
+        self.deleteMembers(roomCode, "id", userID)
+
+    def isGuest(self, roomCode, userID):
+        return bool(
+            self.query(
+                "SELECT 1 FROM memberships WHERE roomCode = ? AND id = ? AND email = ?",
+                (roomCode, userID, GUEST_EMAIL),
+            )
+        )
+
+    def recordAnswer(self, roomCode, userID, questionNumber, increments):
+        with self.transaction():
+            if not self.query(
+                "SELECT 1 FROM memberships WHERE roomCode = ? AND id = ?",
+                (roomCode, userID),
+            ):
+                room = self.findRoom(roomCode, ())
+                return answerError(room, None)
+            if not self.execute(
+                "INSERT OR IGNORE INTO answers VALUES (?, ?, ?)",
+                (roomCode, userID, questionNumber),
+            ):
+                return answerError(True, True)
+            fields = [field for field in SCORE_FIELDS if field in increments]
+            if fields:
+                self.execute(
+                    "UPDATE memberships SET "
+                    + ", ".join(f"{field} = IFNULL({field}, 0) + ?" for field in fields)
+                    + " WHERE roomCode = ? AND id = ?",
+                    (*(increments[field] for field in fields), roomCode, userID),
+                )
+        return None
+
+    def writeScores(self, roomCode, members):
+        with self.transaction():
+            for member in members:
+                self.execute(
+                    "UPDATE memberships SET points = ?, trueAnswers = ?, "
+                    "falseAnswers = ? WHERE roomCode = ? AND id = ?",
+                    (
+                        *(member[field] for field in SCORE_FIELDS),
+                        roomCode,
+                        member["id"],
+                    ),
+                )
+                for number in member["answeredQuestions"]:
+                    self.execute(
+                        "INSERT OR IGNORE INTO answers VALUES (?, ?, ?)",
+                        (roomCode, member["id"], number),
+                    )
+
+    def leaderboard(self, roomCode, ownerName, limit=None, offset=0):
+        where = "WHERE roomCode = ? AND name != ?"
+        total = self.query(
+            f"SELECT count(*) AS total FROM memberships {where}", (roomCode, ownerName)
+        )[0]["total"]
+        rows = self.query(
+            f"SELECT * FROM memberships {where} "
+            "ORDER BY IFNULL(points, 0) DESC, joined LIMIT ? OFFSET ?",
+            (roomCode, ownerName, -1 if limit is None else limit, offset),
+        )
+        return total, [leaderboardEntry(rowDocument(row)) for row in rows]
+
+    def rank(self, roomCode, ownerName, userID):
+        rows = self.query(
+            "SELECT * FROM memberships WHERE roomCode = ? AND id = ?",
+            (roomCode, userID),
+        )
+        if not rows or rows[0]["name"] == ownerName:
+            return None
+        member = rowDocument(rows[0])
+        points = member.get("points", 0)
+        ahead = self.query(
+            "SELECT count(*) AS ahead FROM memberships "
+            "WHERE roomCode = ? AND name != ? AND (IFNULL(points, 0) > ? "
+            "OR (IFNULL(points, 0) = ? AND joined < ?))",
+            (roomCode, ownerName, points, points, member["joined"]),
+        )[0]["ahead"]
+        return {"rank": ahead + 1, **leaderboardEntry(member)}
+
+    def loadRoom(self, roomCode):
+        room = self.findRoom(roomCode)
+        if not room:
+            return None
+        room["questions"] = self.questions(roomCode)
+        room["members"] = self.members(roomCode)
+        return room
+
+    # Archive
+
+    def expiredRooms(self, endedBefore, idleBefore, limit):
+        rows = self.query(
+            "SELECT code, gameStarted, questionCount, activeAt, endedAt FROM rooms "
+            "WHERE endedAt < ? "
+            "OR activeAt < ? OR (activeAt IS NULL AND time < ?) LIMIT ?",
+            (endedBefore, idleBefore, idleBefore, limit),
+        )
+        # Rooms with questions, and rooms from before activity was tracked,
+        # count as played like in RoomStore
+        return [
+            (
+                row["code"],
+                row["endedAt"] is not None
+                or bool(row["gameStarted"])
+                or bool(row["questionCount"])
+                or row["activeAt"] is None,
+            )
+            for row in rows
+        ]
+
+    def saveArchive(self, document):
+        document = dict(document)
+        history = document.pop("history")
+        archivedAt = document.pop("archivedAt").timestamp()
+        self.execute(
+            "INSERT OR REPLACE INTO archivedRooms (code, archivedAt, document, "
+            "history) VALUES (?, ?, ?, ?)",
+            (document["code"], archivedAt, json.dumps(document), history),
+        )
+
+    def archivedRoom(self, roomCode):
+        rows = self.query(
+            "SELECT document FROM archivedRooms WHERE code = ?", (roomCode,)
+        )
+        return json.loads(rows[0]["document"]) if rows else None
+
+    def expireArchives(self, before):
+        self.execute("DELETE FROM archivedRooms WHERE archivedAt < ?", (before,))
+
+    # Migration
+
+    def migrateAll(self):
+        # Rooms are created in the current shape, nothing to migrate
+        return 0
+
+
+class Transaction:
+    # Holds the store lock for the whole transaction, nested uses join the
+    # outer one
+    def __init__(self, store):
+        self.store = store
+        self.outer = False
+
+    def __enter__(self):
+        self.store.lock.acquire()
+        self.outer = not self.store.connection.in_transaction
+        if self.outer:
+            self.store.connection.execute("BEGIN IMMEDIATE")
+        return self
+
+    def __exit__(self, errorType, error, traceback):
+        try:
+            if self.outer:
+                self.store.connection.execute(
+                    "COMMIT" if errorType is None else "ROLLBACK"
+                )
+        finally:
+            self.store.lock.release()
+        return False
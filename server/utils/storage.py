@@ -0,0 +1,38 @@
+import asyncio
+from config import Config
+from utils.database import getAsyncDatabase, getDatabase
+from utils.roomStore import AsyncRoomStore, RoomStore
+
+
+class ThreadedAsyncStore:
+    # Async methods for a store without an async driver, each call runs on a
+    # thread so the event loop never waits on the database
+    def __init__(self, store):
+        self.store = store
+
+    def __getattr__(self, name):
+        method = getattr(self.store, name)
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(method, *args, **kwargs)
+
+        return call
+
+
+def openStore():
+    # Config.Storage.BACKEND picks where users, rooms and scores live
+    if Config.Storage.BACKEND == "sqlite":
+        from utils.sqliteStore import SqliteStore
+
+        return SqliteStore(Config.Storage.SQLITE_PATH)
+    return RoomStore(getDatabase)
+
+
+def openAsyncStore(store):
+    if isinstance(store, RoomStore):
+        return AsyncRoomStore(getAsyncDatabase, store)
+    return ThreadedAsyncStore(store)
+
+
+def usesMongo():
+    return Config.Storage.BACKEND == "mongo"
@@ -0,0 +1,51 @@
+from threading import Lock
+from time import monotonic, time
+from utils.questions import revealTimes
+
+
+class AnswerClock:
+    # When each player was served their current question, only for live games
+    def __init__(self):
+        self.rooms = {}
+        self.lock = Lock()
+
+    def start(self, roomCode):
+        with self.lock:
+            # Starting a running game again keeps its players' clocks
+            self.rooms.setdefault(roomCode, {"startedAt": monotonic(), "players": {}})
+
+    def end(self, roomCode):
+        with self.lock:
+            self.rooms.pop(roomCode, None)
+
+    def join(self, roomCode, userID):
+        # Late joiners start question 1 now, not when the game began
+        with self.lock:
+            room = self.rooms.get(roomCode)
+            if room is not None:
+                room["players"].setdefault(userID, (1, monotonic()))
+
+    def elapsed(self, roomCode, userID, questionNumber):
+        # Seconds since the question was served, None when this process didn't
+        room = self.rooms.get(roomCode)
+        if room is None:
+            return None
+        number, servedAt = room["players"].get(userID, (1, room["startedAt"]))
+        if number != questionNumber:
+            return None
+        return monotonic() - servedAt
+
+    def advance(self, roomCode, userID, questionNumber):
+        # The client shows the next question as soon as this one is answered
+        with self.lock:
+            room = self.rooms.get(roomCode)
+            if room is not None:
+                room["players"][userID] = (questionNumber + 1, monotonic())
+
+
+def answerElapsed(answerClock, liveRoom, roomCode, userID, questionNumber):
+    if liveRoom is not None and liveRoom.schedule:
+        # Paced games show every player the question at its reveal time
+        questions = liveRoom.questions[:questionNumber]
+        return time() - list(revealTimes(questions, liveRoom.schedule))[-1]
+    return answerClock.elapsed(roomCode, userID, questionNumber)
@@ -0,0 +1,51 @@
+from collections import OrderedDict
+from datetime import datetime, timezone
+from threading import Lock
+from time import monotonic
+from pymongo.errors import DuplicateKeyError
+
+
+class TokenBlocklist:
+    # Revoked JWT ids stay in the store until the token expires, shared by every
+    # process. Lookups are cached here: revocations for good, misses for
+    # cacheSeconds, so a logout on another process shows up within that time
+    def __init__(self, store, cacheSeconds=30, maxEntries=65536):
+        self.store = store
+        self.cacheSeconds = cacheSeconds
+        self.maxEntries = maxEntries
+        # jti -> (revoked, checkedAt)
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    def revoke(self, jti, expires=None):
+        expiresAt = None
+        if expires is not None:
+            # The TTL index drops the entry once the token couldn't be used anyway
+            expiresAt = datetime.fromtimestamp(expires, timezone.utc)
+        try:
+            self.store.revokeToken(jti, datetime.now(timezone.utc), expiresAt)
+        except DuplicateKeyError:
+            # Logged out twice with the same token
+            pass
+        self.remember(jti, True)
+
+    def isRevoked(self, jti):
+        now = monotonic()
+        with self.lock:
+            entry = self.entries.get(jti)
+            if entry is not None and (entry[0] or now - entry[1] < self.cacheSeconds):
+                self.entries.move_to_end(jti)
+                return entry[0]
+        revoked = self.store.isTokenRevoked(jti)
+        self.remember(jti, revoked, now)
+        return revoked
+
+    def remember(self, jti, revoked, checkedAt=None):
+        with self.lock:
+            self.entries[jti] = (revoked, checkedAt or monotonic())
+            self.entries.move_to_end(jti)
+            while len(self.entries) > self.maxEntries:
+                self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,49 @@
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+
+
+class PooledWsgiInstance(WsgiToAsgiInstance):
+    def __init__(self, wsgiApplication, executor):
+        super().__init__(wsgiApplication)
+        self.executor = executor
+
+    async def run_wsgi_app(self, body):
+        await sync_to_async(
+            self.runSync, thread_sensitive=False, executor=self.executor
+        )(body)
+
+    def runSync(self, body):
+        # asgiref's run_wsgi_app, without its single shared thread
+        environ = self.build_environ(self.scope, body)
+        sent = 0
+        for output in self.wsgi_application(environ, self.start_response):
+            if not self.response_started:
+                self.response_started = True
+                self.sync_send(self.response_start)
+            if self.response_content_length is not None:
+                output = output[: self.response_content_length - sent]
+            self.sync_send(
+                {"type": "http.response.body", "body": output, "more_body": True}
+            )
+            sent += len(output)
+            if sent == self.response_content_length:
+                break
+        if not self.response_started:
+            self.response_started = True
+            self.sync_send(self.response_start)
+        self.sync_send({"type": "http.response.body"})
+
+
+class PooledWsgiToAsgi(WsgiToAsgi):
+    # WsgiToAsgi runs every request on one thread shared by the whole process,
+    # so a slow Flask route (a bcrypt login) queued all the others behind it.
+    # Here they run on a pool of threads
+    def __init__(self, wsgiApplication, threads=32):
+        super().__init__(wsgiApplication)
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix="wsgi")
+
+    async def __call__(self, scope, receive, send):
+        await PooledWsgiInstance(self.wsgi_application, self.executor)(
+            scope, receive, send
+        )